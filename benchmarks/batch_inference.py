@@ -0,0 +1,88 @@
+"""
+
+File Name: batch_inference.py
+Origin: Netflora (https://github.com/NetFlora/Netflora)
+
+Usage:
+    $ python -m benchmarks.batch_inference --weights model_weights.pt --source processing/output_tiles --batch-sizes 1 2 4 8
+
+"""
+
+import argparse
+
+import numpy as np
+import torch
+
+from models.experimental import attempt_load
+from utils.datasets import LoadImages, batch_images
+from utils.general import check_img_size, non_max_suppression
+from utils.torch_utils import select_device, time_synchronized
+
+
+def load_images(source, img_size, stride, n):
+    # Up to n letterboxed tiles from a folder, or random ones without a source
+    if not source:
+        rng = np.random.default_rng(0)
+        return [(f'tile_{i}.jpg', rng.integers(0, 256, (3, img_size, img_size), dtype=np.uint8), None, None)
+                for i in range(n)]
+    images = []
+    for path, img, _, cap in LoadImages(source, img_size=img_size, stride=stride):
+        images.append((path, img, None, cap))
+        if len(images) == n:
+            break
+    return images
+
+
+def run(model, images, batch_size, device, half, conf_thres, iou_thres):
+    # Detections per image and tiles/s for one batch size
+    dets, t = [], 0.0
+    for _, img, _, _ in batch_images(images, batch_size, device.type != 'cpu'):
+        t0 = time_synchronized()
+        img = img.to(device)
+        img = img.half() if half else img.float()
+        img /= 255.0
+        with torch.no_grad():
+            pred = model(img)[0]
+        pred = non_max_suppression(pred, conf_thres, iou_thres)
+        t += time_synchronized() - t0
+        dets += [d.float().cpu() for d in pred]
+    return dets, len(images) / t
+
+
+def main(opt):
+    device = select_device(opt.device)
+    half = device.type != 'cpu'
+    model = attempt_load(opt.weights, map_location=device)
+    stride = int(model.stride.max())
+    img_size = check_img_size(opt.img_size, s=stride)
+    if half:
+        model.half()
+
+    images = load_images(opt.source, img_size, stride, opt.images)
+    model(torch.zeros(1, 3, img_size, img_size).to(device).type_as(next(model.parameters())))  # warmup
+    print(f'{len(images)} images at {img_size}, {device.type}{" fp16" if half else ""}')
+    print(f"{'batch':>6}{'tiles/s':>10}{'speedup':>10}{'identical':>11}{'max |diff|':>12}")
+
+    reference, base = None, None
+    for batch_size in opt.batch_sizes:
+        dets, rate = run(model, images, batch_size, device, half, opt.conf_thres, opt.iou_thres)
+        if reference is None:
+            reference, base = dets, rate
+        same = sum(a.shape == b.shape and torch.equal(a, b) for a, b in zip(dets, reference))
+        diff = max((float((a - b).abs().max()) for a, b in zip(dets, reference) if a.shape == b.shape and len(a)),
+                   default=0.0)
+        print(f'{batch_size:>6}{rate:>10.2f}{rate / base:>9.2f}x{same:>7}/{len(dets):<3}{diff:>12.2e}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Tiles/s and per-tile agreement of batched inference.")
+    parser.add_argument('--weights', type=str, default='model_weights.pt', help='model.pt path')
+    parser.add_argument('--source', type=str, default='', help='tile folder (default: random tiles)')
+    parser.add_argument('--img-size', type=int, default=640, help='inference size (pixels)')
+    parser.add_argument('--batch-sizes', nargs='+', type=int, default=[1, 2, 4, 8, 16], help='batch sizes to time')
+    parser.add_argument('--images', type=int, default=64, help='images per run')
+    parser.add_argument('--conf-thres', type=float, default=0.01, help='object confidence threshold')
+    parser.add_argument('--iou-thres', type=float, default=0.45, help='IOU threshold for NMS')
+    parser.add_argument('--device', default='', help='cuda device, i.e. 0 or cpu')
+    opt = parser.parse_args()
+    main(opt)
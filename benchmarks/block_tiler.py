@@ -0,0 +1,130 @@
+"""
+
+File Name: block_tiler.py
+Origin: Netflora (https://github.com/NetFlora/Netflora)
+
+Usage:
+    $ python -m benchmarks.block_tiler --source ortho.tif --size 1536 --overlap 768
+    $ python -m benchmarks.block_tiler --synthetic 12000 --size 1536 --overlap 768
+
+"""
+
+import argparse
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import rasterio
+from rasterio.transform import from_origin
+from rasterio.windows import Window
+
+from utils.block_reader import BlockCache, BlockReader
+from utils.tiling import GDAL_CACHE_MIN, gdal_cache_mb, tile_windows
+
+
+def make_synthetic(path, size, block=256, bands=4):
+    # Tiled, DEFLATE-compressed RGBA GeoTIFF resembling an orthophoto
+    rng = np.random.default_rng(0)
+    profile = dict(driver='GTiff', width=size, height=size, count=bands, dtype='uint8', crs='EPSG:31980',
+                   transform=from_origin(600000, 8900000, 0.05, 0.05), tiled=True,
+                   blockxsize=block, blockysize=block, compress='deflate')
+    with rasterio.open(path, 'w', **profile) as dst:
+        for bi in range(0, size, block):
+            for bj in range(0, size, block):
+                h, w = min(block, size - bi), min(block, size - bj)
+                data = rng.integers(0, 255, (bands, h, w), dtype=np.uint8)
+                dst.write(data, window=Window(bj, bi, w, h))
+    return path
+
+
+def simulate(windows, block_h, block_w, capacity):
+    # Block LRU of capacity blocks replayed over a window sequence, each window touching its blocks in raster
+    # order; returns the BlockCache, whose misses are the blocks decoded
+    cache = BlockCache(capacity)
+    for w in windows:
+        for bi in range(int(w.row_off) // block_h, (int(w.row_off + w.height) - 1) // block_h + 1):
+            for bj in range(int(w.col_off) // block_w, (int(w.col_off + w.width) - 1) // block_w + 1):
+                if cache.get((bi, bj)) is None:
+                    cache.put((bi, bj), True)
+    return cache
+
+
+def run_window(source, size, overlap):
+    # Original loop, plain src.read per window; GDAL_CACHEMAX (MB) comes from the environment
+    with rasterio.open(source) as src:
+        windows = tile_windows(src.width, src.height, size, overlap)
+        t = time.time()
+        for window in windows:
+            tile = src.read(window=window)
+            np.any(tile)
+    return time.time() - t
+
+
+def run_block(src, windows, tile_size, cache_blocks):
+    reader = BlockReader(src, tile_size=tile_size, cache_blocks=cache_blocks)
+    t = time.time()
+    for _, tile in reader.iter_tiles(windows):
+        np.any(tile)
+    return time.time() - t, reader
+
+
+def main(opt):
+    if opt.read:  # child process of the window-reader run
+        print(run_window(opt.source, opt.size, opt.overlap))
+        return
+
+    tmp = None
+    source = opt.source
+    if source is None:
+        tmp = tempfile.TemporaryDirectory()
+        source = make_synthetic(os.path.join(tmp.name, 'synthetic.tif'), opt.synthetic)
+
+    with rasterio.open(source) as src:
+        block_h, block_w = src.block_shapes[0]
+        block_bytes = block_h * block_w * src.count * np.dtype(src.dtypes[0]).itemsize
+        windows = tile_windows(src.width, src.height, opt.size, opt.overlap)
+        budget = gdal_cache_mb(src, opt.size, opt.overlap)
+        print(f'{source}: {src.width}x{src.height}x{src.count}, blocks {block_w}x{block_h}, {len(windows)} tiles '
+              f'({opt.size}/{opt.overlap}), tiler GDAL_CACHEMAX budget {budget}MB')
+
+    # Window reader: the current loop at each GDAL_CACHEMAX, in a fresh process so GDAL reads it (MB) from the
+    # environment at startup. GDAL does not report its cache misses, so the bytes it decodes come from
+    # replaying the windows through an LRU of the same size (GDAL_CACHEMAX / 1.25 block overhead).
+    print(f"\n{'reader':<8}{'GDAL_CACHEMAX':>14}{'block LRU':>11}{'time (s)':>10}{'decoded (MB)':>14}")
+    for mb in opt.gdal_cache_mb or sorted({budget, GDAL_CACHE_MIN}, reverse=True):
+        env = dict(os.environ, GDAL_CACHEMAX=str(mb))
+        r = subprocess.run([sys.executable, '-m', 'benchmarks.block_tiler', '--source', source, '--size',
+                            str(opt.size), '--overlap', str(opt.overlap), '--read'], env=env, capture_output=True,
+                           text=True, check=True)
+        t_window = float(r.stdout.strip().splitlines()[-1])
+        cache = simulate(windows, block_h, block_w, math.ceil(mb * 2 ** 20 / 1.25 / block_bytes))
+        print(f"{'window':<8}{mb:>12}MB{'-':>11}{t_window:>10.2f}{cache.misses * block_bytes / 1E6:>13.1f}*")
+
+    # Block reader as the tiler runs it: GDAL cache at the floor, blocks kept in the reader's own LRU
+    with rasterio.Env(GDAL_CACHEMAX=GDAL_CACHE_MIN * 2 ** 20):  # an int is passed on in bytes
+        with rasterio.open(source) as src:
+            t_block, reader = run_block(src, windows, opt.size, opt.cache_blocks)
+    lru_mb = reader.cache.maxsize * block_bytes / 2 ** 20
+    print(f"{'block':<8}{GDAL_CACHE_MIN:>12}MB{lru_mb:>9.0f}MB{t_block:>10.2f}{reader.bytes_decoded / 1E6:>14.1f}")
+    print(f'* LRU model of the GDAL block cache; block reader: measured, {reader.cache.hits} hits / '
+          f'{reader.cache.misses} misses')
+    if tmp is not None:
+        tmp.cleanup()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--source', type=str, default=None, help='orthophoto path (default: synthetic raster)')
+    parser.add_argument('--synthetic', type=int, default=8192, help='synthetic raster side (pixels)')
+    parser.add_argument('--size', type=int, default=1536, help='tile size (pixels)')
+    parser.add_argument('--overlap', type=int, default=768, help='tile overlap (pixels)')
+    parser.add_argument('--cache-blocks', type=int, default=None, help='block LRU capacity (default: one tile row)')
+    parser.add_argument('--gdal-cache-mb', nargs='+', type=int, default=None,
+                        help='GDAL_CACHEMAX (MB) values for the window reader (default: tiler budget and floor)')
+    parser.add_argument('--read', action='store_true', help=argparse.SUPPRESS)
+    opt = parser.parse_args()
+    main(opt)
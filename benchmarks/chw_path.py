@@ -0,0 +1,128 @@
+"""
+
+File Name: chw_path.py
+Origin: Netflora (https://github.com/NetFlora/Netflora)
+
+Usage:
+    $ python -m benchmarks.chw_path --tile-size 640 --img-size 640 --tiles 200
+    $ python -m benchmarks.chw_path --tile-size 1536 --img-size 640 --batch-size 8
+
+"""
+
+import argparse
+import time
+
+import cv2
+import numpy as np
+import torch
+
+from utils.datasets import LoadTiles, batch_images, letterbox, letterbox_chw
+
+
+def jpeg_path(tile, img_size, buffers):
+    # Tiler JPEG on disk + LoadImages: HWC BGR, encode, decode, letterbox, flip and transpose back
+    return [
+        ('to HWC BGR', lambda x: np.ascontiguousarray(x.transpose(1, 2, 0)[:, :, ::-1])),
+        ('jpeg encode', lambda x: cv2.imencode('.jpg', x, [cv2.IMWRITE_JPEG_QUALITY, 75])[1]),
+        ('jpeg decode', lambda x: cv2.imdecode(x, cv2.IMREAD_COLOR)),
+        ('letterbox', lambda x: letterbox(x, img_size)[0]),
+        ('BGR HWC to RGB CHW', lambda x: x[:, :, ::-1].transpose(2, 0, 1)),
+        ('ascontiguousarray', np.ascontiguousarray),
+        ('torch.from_numpy', torch.from_numpy),
+    ]
+
+
+def hwc_path(tile, img_size, buffers):
+    # In-memory tiles through the HWC letterbox (LoadTiles before the CHW path)
+    steps = jpeg_path(tile, img_size, buffers)
+    return steps[:1] + steps[3:]
+
+
+def chw_path(tile, img_size, buffers):
+    # letterbox_chw into a reused buffer, shared with the tensor
+    def alloc(shape):
+        if shape not in buffers:
+            buffers[shape] = torch.empty(shape, dtype=torch.uint8).numpy()
+        return buffers[shape]
+
+    return [
+        ('letterbox_chw', lambda x: letterbox_chw(x, img_size, alloc=alloc)[0]),
+        ('torch.from_numpy', torch.from_numpy),
+    ]
+
+
+def batch_path(tile, img_size, buffers, batch_size=8):
+    # detect.py --ortho: LoadTiles letterboxes straight into the next row of the batch tensor (batch_images)
+    batch = {'n': 0}
+
+    def slot(shape):
+        key = (batch_size,) + shape
+        if key not in buffers:
+            buffers[key] = torch.empty(key, dtype=torch.uint8).numpy()
+        batch['n'] = (batch['n'] + 1) % batch_size
+        return buffers[key][batch['n']]
+
+    return [
+        ('letterbox_chw', lambda x: letterbox_chw(x, img_size, alloc=slot)[0]),
+        ('torch.from_numpy', torch.from_numpy),
+    ]
+
+
+def run_loader(tiles, img_size, batch_size):
+    # The loader detect.py --ortho runs, LoadTiles over the tiles + batch_images, in ms per tile
+    stream = [(k, tile, None) for k, tile in enumerate(tiles)]
+    t0 = time.perf_counter()
+    n = sum(len(paths) for paths, _, _, _ in batch_images(LoadTiles(stream, img_size, hwc=False), batch_size))
+    return (time.perf_counter() - t0) / n * 1E3
+
+
+def as_numpy(x):
+    return x.numpy() if isinstance(x, torch.Tensor) else x
+
+
+def run(path, tiles, img_size):
+    # Per step: mean time (ms), copies (output not sharing the input memory) and new allocations
+    # (copies not landing in a preallocated buffer), per tile
+    buffers = {}
+    steps = path(tiles[0], img_size, buffers)
+    t = np.zeros(len(steps))
+    copies, allocs = np.zeros(len(steps), dtype=int), np.zeros(len(steps), dtype=int)
+    for n, tile in enumerate(tiles):
+        x = tile
+        for i, (_, f) in enumerate(steps):
+            t0 = time.perf_counter()
+            y = f(x)
+            t[i] += time.perf_counter() - t0
+            if n == 0:
+                copied = not np.shares_memory(as_numpy(x), as_numpy(y))
+                copies[i] = copied
+                allocs[i] = copied and not any(np.shares_memory(as_numpy(y), b) for b in buffers.values())
+            x = y
+    return [(name, t[i] / len(tiles) * 1E3, copies[i], allocs[i]) for i, (name, _) in enumerate(steps)]
+
+
+def main(opt):
+    rng = np.random.default_rng(0)
+    base = rng.integers(0, 256, (3, opt.tile_size, opt.tile_size), dtype=np.uint8)
+    distinct = [np.roll(base, k, axis=2) for k in range(8)]
+    tiles = [distinct[k % 8] for k in range(opt.tiles)]
+
+    batched = lambda tile, img_size, buffers: batch_path(tile, img_size, buffers, opt.batch_size)
+    for name, path in (('jpeg', jpeg_path), ('hwc', hwc_path), ('chw', chw_path), ('batch', batched)):
+        rows = run(path, tiles, opt.img_size)
+        total = sum(r[1] for r in rows)
+        print(f'{name}: {total:.3f} ms/tile, {sum(r[2] for r in rows)} copies, {sum(r[3] for r in rows)} allocations')
+        for step, ms, copied, allocated in rows:
+            print(f'    {step:<20} {ms:8.3f} ms  {"copy" if copied else "view":<5} {"alloc" if allocated else ""}')
+    print(f'LoadTiles + batch_images (batch {opt.batch_size}): {run_loader(tiles, opt.img_size, opt.batch_size):.3f} '
+          f'ms/tile')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Per-tile copies, allocations and time from CHW tile to tensor.")
+    parser.add_argument('--tile-size', type=int, default=640, help='tile size (e.g. read decimated to --img-size)')
+    parser.add_argument('--img-size', type=int, default=640, help='model input size')
+    parser.add_argument('--tiles', type=int, default=200, help='tiles per path')
+    parser.add_argument('--batch-size', type=int, default=8, help='detect.py --batch-size for the batch path')
+    opt = parser.parse_args()
+    main(opt)
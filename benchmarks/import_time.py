@@ -0,0 +1,59 @@
+"""
+
+File Name: import_time.py
+Origin: Netflora (https://github.com/NetFlora/Netflora)
+
+Usage:
+    $ python -m benchmarks.import_time --modules tiles utils.tiling --runs 5
+
+"""
+
+import argparse
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = __file__.rsplit('benchmarks', 1)[0] or '.'
+
+
+def cold_import(module, runs=5):
+    # Wall time of a fresh interpreter importing module, minus an empty interpreter
+    def run(code):
+        times = []
+        for _ in range(runs):
+            t = time.perf_counter()
+            subprocess.run([sys.executable, '-c', code], cwd=ROOT, check=True)
+            times.append(time.perf_counter() - t)
+        return statistics.median(times)
+
+    return run(f'import {module}') - run('pass')
+
+
+def top_imports(module, n=10):
+    # Slowest cumulative imports from python -X importtime, (seconds, package)
+    r = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'], cwd=ROOT,
+                       capture_output=True, text=True, check=True)
+    rows = []
+    for line in r.stderr.splitlines():
+        m = re.match(r'import time:\s+\d+ \|\s+(\d+) \|(\s*)(\S+)', line)
+        if m and len(m.group(2)) <= 3:  # top two nesting levels
+            rows.append((int(m.group(1)) / 1E6, m.group(3)))
+    return sorted(rows, reverse=True)[:n]
+
+
+def main(opt):
+    for module in opt.modules:
+        print(f'{module:<16} {cold_import(module, opt.runs) * 1E3:8.0f} ms')
+        for t, name in top_imports(module, opt.top):
+            print(f'    {name:<28} {t * 1E3:8.0f} ms')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Cold-start import time of the tiling entry points.")
+    parser.add_argument('--modules', nargs='+', default=['tiles', 'utils.tiling'], help='modules to import')
+    parser.add_argument('--runs', type=int, default=5, help='runs per module (median)')
+    parser.add_argument('--top', type=int, default=10, help='slowest imports to list per module')
+    opt = parser.parse_args()
+    main(opt)
@@ -0,0 +1,114 @@
+"""
+
+File Name: onnx_inference.py
+Origin: Netflora (https://github.com/NetFlora/Netflora)
+
+Usage:
+    $ python -m benchmarks.onnx_inference --weights model_weights.pt --source processing/output_tiles
+    $ python -m benchmarks.onnx_inference --weights model_weights.pt --onnx model_weights.onnx --threads 8
+
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+
+import torch
+from scipy.optimize import linear_sum_assignment
+
+from benchmarks.batch_inference import load_images
+from export import export_onnx
+from models.experimental import attempt_load
+from utils.datasets import batch_images
+from utils.general import box_iou, check_img_size, non_max_suppression
+from utils.onnx_backend import OnnxModel
+from utils.torch_utils import TracedModel, time_synchronized
+
+
+def run(model, images, batch_size, conf_thres, iou_thres):
+    # Detections per image, per-forward latencies (ms) and tiles/s, CPU only
+    dets, latency, t = [], [], 0.0
+    for _, img, _, _ in batch_images(images, batch_size):
+        t0 = time_synchronized()
+        img = img.float() / 255.0
+        with torch.no_grad():
+            pred = model(img)[0]
+        t1 = time_synchronized()
+        pred = non_max_suppression(pred, conf_thres, iou_thres)
+        t += time_synchronized() - t0
+        latency.append(1E3 * (t1 - t0))
+        dets += [d.float() for d in pred]
+    return dets, latency, len(images) / t
+
+
+def agreement(dets, reference, iou_thres=0.9):
+    # Images with the same detection count, detections without a same-class reference box at iou_thres, and
+    # the largest box/score difference among the others. Detections are paired one to one by IoU first: NMS
+    # order differs between backends on tied scores
+    same, unmatched, diff = 0, 0, 0.0
+    for a, b in zip(dets, reference):
+        same += a.shape == b.shape
+        if not len(a) or not len(b):
+            unmatched += len(a)
+            continue
+        iou = box_iou(a[:, :4], b[:, :4]) * (a[:, 5:6] == b[:, 5]).float()
+        i, j = linear_sum_assignment(iou.numpy(), maximize=True)
+        ok = iou[i, j] >= iou_thres
+        unmatched += len(a) - int(ok.sum())
+        if ok.any():
+            diff = max(diff, float((a[i[ok]] - b[j[ok]]).abs().max()))
+    return same, unmatched, diff
+
+
+def main(opt):
+    torch.set_num_threads(opt.threads)
+    model = attempt_load(opt.weights, map_location='cpu')
+    stride = int(model.stride.max())
+    img_size = check_img_size(opt.img_size, s=stride)
+
+    tmp = None
+    onnx_path = opt.onnx
+    if not onnx_path:
+        tmp = tempfile.TemporaryDirectory()
+        onnx_path = export_onnx(opt.weights, os.path.join(tmp.name, 'model.onnx'), img_size)
+
+    backends = {'torchscript': TracedModel(model, torch.device('cpu'), img_size, weights=opt.weights),
+                'onnxruntime': OnnxModel(onnx_path, threads=opt.threads)}
+    images = load_images(opt.source, img_size, stride, opt.images)
+    print(f'{len(images)} images at {img_size}, cpu, {opt.threads} threads')
+    print(f"{'backend':<13}{'batch':>6}{'p50 ms':>9}{'p90 ms':>9}{'tiles/s':>10}{'speedup':>10}{'same count':>12}"
+          f"{'unmatched':>11}{'max |diff|':>13}")
+
+    reference, base = None, {}
+    for name, model in backends.items():
+        for _ in range(opt.warmup):
+            model(torch.zeros(1, 3, img_size, img_size))
+        for batch_size in opt.batch_sizes:
+            dets, latency, rate = run(model, images, batch_size, opt.conf_thres, opt.iou_thres)
+            reference = reference or dets  # torchscript, first batch size
+            base.setdefault(batch_size, rate)
+            same, unmatched, diff = agreement(dets, reference)
+            p50 = statistics.median(latency)
+            p90 = statistics.quantiles(latency, n=10)[-1] if len(latency) > 1 else p50
+            print(f'{name:<13}{batch_size:>6}{p50:>9.1f}{p90:>9.1f}{rate:>10.2f}{rate / base[batch_size]:>9.2f}x'
+                  f'{same:>8}/{len(dets):<4}{unmatched:>10}{diff:>13.2e}')
+
+    if tmp is not None:
+        tmp.cleanup()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="CPU latency and throughput of TorchScript vs ONNX Runtime.")
+    parser.add_argument('--weights', type=str, default='model_weights.pt', help='model.pt path')
+    parser.add_argument('--onnx', type=str, default='', help='exported .onnx (default: export --weights to a temp dir)')
+    parser.add_argument('--source', type=str, default='', help='tile folder (default: random tiles)')
+    parser.add_argument('--img-size', type=int, default=640, help='inference size (pixels)')
+    parser.add_argument('--batch-sizes', nargs='+', type=int, default=[1, 4, 8], help='batch sizes to time')
+    parser.add_argument('--images', type=int, default=32, help='images per run')
+    parser.add_argument('--threads', type=int, default=os.cpu_count(), help='intra-op threads for both backends')
+    parser.add_argument('--warmup', type=int, default=3, help='untimed forward passes per backend')
+    parser.add_argument('--conf-thres', type=float, default=0.01, help='object confidence threshold')
+    parser.add_argument('--iou-thres', type=float, default=0.45, help='IOU threshold for NMS')
+    opt = parser.parse_args()
+    main(opt)
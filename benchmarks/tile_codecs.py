@@ -0,0 +1,76 @@
+"""
+
+File Name: tile_codecs.py
+Origin: Netflora (https://github.com/NetFlora/Netflora)
+
+Usage:
+    $ python -m benchmarks.tile_codecs --source ortho.tif --size 1536 --overlap 128 --tiles 64
+
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import rasterio
+
+from benchmarks.block_tiler import make_synthetic
+from utils.tile_writer import TileWriter
+from utils.tiling import iter_tiles
+
+SETTINGS = [  # (codec, quality, subsampling)
+    ('jpg', 75, '420'),
+    ('jpg', 90, '420'),
+    ('jpg', 95, '444'),
+    ('webp', 80, '420'),
+    ('webp', 101, '420'),  # lossless
+    ('png', 1, '420'),
+    ('npy', 0, '420'),
+]
+
+
+def load_tiles(source, size, overlap, n):
+    tiles = []
+    with rasterio.open(source) as src:
+        for _, tile in iter_tiles(src, size, overlap):
+            if np.any(tile):
+                tiles.append(tile)
+            if len(tiles) == n:
+                break
+    return tiles
+
+
+def run(tiles, out_dir, codec, quality, subsampling, workers):
+    t = time.time()
+    with TileWriter(out_dir, codec, quality, subsampling, workers=workers) as writer:
+        for i, tile in enumerate(tiles):
+            writer.submit(i, f'tile_{i}.{codec}', tile)
+    dt = time.time() - t
+    return len(tiles) / dt, writer.bytes_written / len(tiles)
+
+
+def main(opt):
+    with tempfile.TemporaryDirectory() as tmp:
+        source = opt.source or make_synthetic(os.path.join(tmp, 'synthetic.tif'), opt.synthetic)
+        tiles = load_tiles(source, opt.size, opt.overlap, opt.tiles)
+        print(f'{source}: {len(tiles)} tiles of {opt.size}px, {opt.workers} encoder threads')
+        print(f"{'codec':<8}{'quality':>8}{'chroma':>8}{'tiles/s':>10}{'KB/tile':>10}")
+        for codec, quality, subsampling in SETTINGS:
+            out_dir = os.path.join(tmp, f'{codec}_{quality}_{subsampling}')
+            os.makedirs(out_dir)
+            tps, bpt = run(tiles, out_dir, codec, quality, subsampling, opt.workers)
+            print(f"{codec:<8}{quality:>8}{subsampling:>8}{tps:>10.1f}{bpt / 1E3:>10.1f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--source', type=str, default=None, help='orthophoto path (default: synthetic raster)')
+    parser.add_argument('--synthetic', type=int, default=4096, help='synthetic raster side (pixels)')
+    parser.add_argument('--size', type=int, default=1536, help='tile size (pixels)')
+    parser.add_argument('--overlap', type=int, default=128, help='tile overlap (pixels)')
+    parser.add_argument('--tiles', type=int, default=32, help='tiles encoded per codec')
+    parser.add_argument('--workers', type=int, default=4, help='encoder threads')
+    opt = parser.parse_args()
+    main(opt)
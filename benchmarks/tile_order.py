@@ -0,0 +1,98 @@
+"""
+
+File Name: tile_order.py
+Origin: Netflora (https://github.com/NetFlora/Netflora)
+
+Usage:
+    $ python -m benchmarks.tile_order --source ortho.tif --size 2048 --overlap 1024
+    $ python -m benchmarks.tile_order --synthetic 12288 --size 2048 --overlap 1024
+
+"""
+
+import argparse
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import rasterio
+
+from benchmarks.block_tiler import make_synthetic, simulate
+from utils.block_reader import BlockReader
+from utils.tiling import gdal_cache_mb, order_windows, tile_windows
+
+ORDERS = ['row', 'zorder', 'hilbert']
+
+
+def read_windows(source, size, overlap, order):
+    # Window reader (plain src.read) in this order; GDAL_CACHEMAX comes from the environment
+    with rasterio.open(source) as src:
+        windows = order_windows(tile_windows(src.width, src.height, size, overlap), size, overlap, order)
+        t = time.time()
+        for window in windows:
+            np.any(src.read(window=window))
+    return time.time() - t
+
+
+def main(opt):
+    if opt.read:  # child process of a window-reader run
+        print(read_windows(opt.source, opt.size, opt.overlap, opt.read))
+        return
+
+    tmp = None
+    source = opt.source
+    if source is None:
+        tmp = tempfile.TemporaryDirectory()
+        source = make_synthetic(os.path.join(tmp.name, 'synthetic.tif'), opt.synthetic)
+
+    with rasterio.open(source) as src:
+        block_h, block_w = src.block_shapes[0]
+        block_bytes = block_h * block_w * src.count * np.dtype(src.dtypes[0]).itemsize
+        grid = tile_windows(src.width, src.height, opt.size, opt.overlap)
+        budgets = {o: gdal_cache_mb(src, opt.size, opt.overlap, o) for o in ('row', 'hilbert')}
+        print(f'{source}: {src.width}x{src.height}x{src.count}, blocks {block_w}x{block_h}, '
+              f'{len(grid)} tiles ({opt.size}/{opt.overlap}), cache budgets: row {budgets["row"]}MB, '
+              f'curve {budgets["hilbert"]}MB')
+
+        print(f"\n{'order':<9}" + ''.join(f'{f"hit rate @{mb}MB":>20}' for mb in budgets.values()))
+        for order in ORDERS:
+            windows = order_windows(grid, opt.size, opt.overlap, order)
+            caches = [simulate(windows, block_h, block_w, math.ceil(mb * 2 ** 20 / 1.25 / block_bytes))
+                      for mb in budgets.values()]
+            rates = [c.hits / max(1, c.hits + c.misses) for c in caches]
+            print(f'{order:<9}' + ''.join(f'{r:>20.1%}' for r in rates))
+
+    print(f"\n{'order':<9}{'GDAL_CACHEMAX':>14}{'window (s)':>12}{'block (s)':>12}{'decoded (MB)':>14}")
+    for order in ORDERS:
+        for mb in sorted(set(budgets.values())):
+            env = dict(os.environ, GDAL_CACHEMAX=str(mb))
+            r = subprocess.run([sys.executable, '-m', 'benchmarks.tile_order', '--source', source, '--size',
+                                str(opt.size), '--overlap', str(opt.overlap), '--read', order],
+                               env=env, capture_output=True, text=True, check=True)
+            t_window = float(r.stdout.strip().splitlines()[-1])
+
+            with rasterio.open(source) as src:
+                windows = order_windows(grid, opt.size, opt.overlap, order)
+                reader = BlockReader(src, cache_blocks=math.ceil(mb * 2 ** 20 / 1.25 / block_bytes))
+                t = time.time()
+                for _, tile in reader.iter_tiles(windows):
+                    np.any(tile)
+                t_block = time.time() - t
+            print(f'{order:<9}{mb:>12}MB{t_window:>12.2f}{t_block:>12.2f}{reader.bytes_decoded / 1E6:>14.1f}')
+
+    if tmp is not None:
+        tmp.cleanup()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Row-major vs space-filling-curve tile order: cache hits, read time.")
+    parser.add_argument('--source', type=str, default=None, help='orthophoto path (default: synthetic raster)')
+    parser.add_argument('--synthetic', type=int, default=12288, help='synthetic raster side (pixels)')
+    parser.add_argument('--size', type=int, default=2048, help='tile size (pixels), Castanheira by default')
+    parser.add_argument('--overlap', type=int, default=1024, help='tile overlap (pixels)')
+    parser.add_argument('--read', type=str, default='', choices=[''] + ORDERS, help=argparse.SUPPRESS)
+    opt = parser.parse_args()
+    main(opt)
@@ -7,6 +7,8 @@ Origin: yolov7 (https://github.com/WongKinYiu/yolov7)
 
 
 import argparse
+import glob
+import os
 import time
 from pathlib import Path
 
@@ -16,18 +18,21 @@ import torch.backends.cudnn as cudnn
 from numpy import random
 
 from models.experimental import attempt_load
-from utils.datasets import LoadStreams, LoadImages
+from utils.datasets import LoadStreams, LoadImages, LoadImagesPrefetch, LoadTiles, batch_images
 from utils.general import check_img_size, check_requirements, check_imshow, non_max_suppression, apply_classifier, \
     scale_coords, xyxy2xywh, strip_optimizer, set_logging, increment_path
 from utils.plots import plot_one_box
 from utils.torch_utils import select_device, load_classifier, time_synchronized, TracedModel
+from utils.onnx_backend import OnnxModel
+from utils.tile_index import TileIndex
+from utils.tiling import TileStream
 
 
 def detect(save_img=False):
     source, weights, view_img, save_txt, imgsz, trace = opt.source, opt.weights, opt.view_img, opt.save_txt, opt.img_size, not opt.no_trace
     save_img = not opt.nosave and not source.endswith('.txt')  # save inference images
-    webcam = source.isnumeric() or source.endswith('.txt') or source.lower().startswith(
-        ('rtsp://', 'rtmp://', 'http://', 'https://'))
+    webcam = not opt.ortho and (source.isnumeric() or source.endswith('.txt') or source.lower().startswith(
+        ('rtsp://', 'rtmp://', 'http://', 'https://')))
 
     # Directories
     save_dir = Path(increment_path(Path(opt.project) / opt.name, exist_ok=opt.exist_ok))  # increment run
@@ -35,16 +40,20 @@ def detect(save_img=False):
 
     # Initialize
     set_logging()
-    device = select_device(opt.device)
+    onnx = opt.backend == 'onnxruntime' or str(weights[0] if isinstance(weights, list) else weights).endswith('.onnx')
+    device = select_device('cpu' if onnx else opt.device)  # ONNX Runtime backend runs on CPU
     half = device.type != 'cpu'  # half precision only supported on CUDA
 
     # Load model
-    model = attempt_load(weights, map_location=device)  # load FP32 model
+    if onnx:  # graph exported by export.py
+        model = OnnxModel(weights[0] if isinstance(weights, list) else weights, threads=opt.threads)
+    else:
+        model = attempt_load(weights, map_location=device)  # load FP32 model
     stride = int(model.stride.max())  # model stride
     imgsz = check_img_size(imgsz, s=stride)  # check img_size
 
-    if trace:
-        model = TracedModel(model, device, opt.img_size)
+    if trace and not onnx:
+        model = TracedModel(model, device, opt.img_size, weights=weights)  # cached per weights/size/device
 
     if half:
         model.half()  # to FP16
@@ -61,8 +70,27 @@ def detect(save_img=False):
         view_img = check_imshow()
         cudnn.benchmark = True  # set True to speed up constant image size inference
         dataset = LoadStreams(source, img_size=imgsz, stride=stride)
+    elif opt.ortho:  # tile the orthophoto in memory, no JPEG round trip
+        stream = TileStream(opt.ortho, opt.tile_size, opt.overlap, index_path=opt.tile_index, dump_dir=opt.dump_tiles,
+                            min_valid=opt.min_valid, out_size=imgsz if opt.decimate else None, bands=opt.bands,
+                            stretch=opt.stretch, aoi=opt.aoi, min_texture=opt.min_texture,
+                            maxsize=opt.queue_size)
+        dataset = LoadTiles(stream, img_size=imgsz, stride=stride, hwc=save_img or view_img,
+                            pin_memory=device.type != 'cpu')
     else:
-        dataset = LoadImages(source, img_size=imgsz, stride=stride)
+        files = source
+        index_path = os.path.join(os.path.dirname(os.path.normpath(source)), 'tile_index.npz')
+        if os.path.isdir(source) and os.path.isfile(index_path):  # tiles.py output: most textured tiles first
+            files = sorted(glob.glob(os.path.join(source, '*.*')))
+            files = TileIndex.load(index_path).order_files(files, opt.min_valid or 0.0, opt.min_texture)
+            print(f'{len(files)} images selected by {index_path}')
+        if opt.workers:
+            dataset = LoadImagesPrefetch(files, img_size=imgsz, stride=stride, workers=opt.workers)
+        else:
+            dataset = LoadImages(files, img_size=imgsz, stride=stride)
+    loader = dataset  # LoadStreams batches its streams, others stack --batch-size same-shape images per forward pass
+    if not webcam:
+        loader = batch_images(dataset, opt.batch_size if dataset.mode == 'image' else 1, device.type != 'cpu')
 
     # Get names and colors
     names = model.module.names if hasattr(model, 'module') else model.names
@@ -75,8 +103,8 @@ def detect(save_img=False):
     old_img_b = 1
 
     t0 = time.time()
-    for path, img, im0s, vid_cap in dataset:
-        img = torch.from_numpy(img).to(device)
+    for path, img, im0s, vid_cap in loader:
+        img = (img if isinstance(img, torch.Tensor) else torch.from_numpy(img)).to(device)
         img = img.half() if half else img.float()  # uint8 to fp16/32
         img /= 255.0  # 0 - 255 to 0.0 - 1.0
         if img.ndimension() == 3:
@@ -109,7 +137,7 @@ def detect(save_img=False):
             if webcam:  # batch_size >= 1
                 p, s, im0, frame = path[i], '%g: ' % i, im0s[i].copy(), dataset.count
             else:
-                p, s, im0, frame = path, '', im0s, getattr(dataset, 'frame', 0)
+                p, s, im0, frame = path[i], '', im0s[i], getattr(dataset, 'frame', 0)
 
             p = Path(p)  # to Path
             save_path = str(save_dir / p.name)  # img.jpg
@@ -176,6 +204,8 @@ if __name__ == '__main__':
     parser.add_argument('--weights', nargs='+', type=str, default='yolov7.pt', help='model.pt path(s)')
     parser.add_argument('--source', type=str, default='processing/output_tiles', help='source')  # file/folder, 0 for webcam
     parser.add_argument('--img-size', type=int, default=640, help='inference size (pixels)')
+    parser.add_argument('--batch-size', type=int, default=1, help='images per forward pass')
+    parser.add_argument('--workers', type=int, default=4, help='image decode threads, 0 to decode inline')
     parser.add_argument('--conf-thres', type=float, default=0.01, help='object confidence threshold')
     parser.add_argument('--iou-thres', type=float, default=0.45, help='IOU threshold for NMS')
     parser.add_argument('--device', default='', help='cuda device, i.e. 0 or 0,1,2,3 or cpu')
@@ -191,6 +221,21 @@ if __name__ == '__main__':
     parser.add_argument('--name', default='exp', help='save results to project/name')
     parser.add_argument('--exist-ok', action='store_true', help='existing project/name ok, do not increment')
     parser.add_argument('--no-trace', action='store_true', help='don`t trace model')
+    parser.add_argument('--backend', type=str, default='torch', choices=['torch', 'onnxruntime'],
+                        help='inference backend, onnxruntime (implied by .onnx --weights) runs export.py/quantize.py output')
+    parser.add_argument('--threads', type=int, default=None, help='--backend onnxruntime intra-op threads')
+    parser.add_argument('--ortho', type=str, default='', help='orthophoto to tile in memory instead of --source')
+    parser.add_argument('--tile-size', type=int, default=1536, help='--ortho tile size (pixels)')
+    parser.add_argument('--overlap', type=int, default=128, help='--ortho tile overlap (pixels)')
+    parser.add_argument('--tile-index', type=str, default='processing/tile_index.npz', help='--ortho tile index output')
+    parser.add_argument('--dump-tiles', type=str, default='', help='also save --ortho tiles as JPEG to this folder (debug)')
+    parser.add_argument('--queue-size', type=int, default=8, help='--ortho tiles buffered ahead of inference')
+    parser.add_argument('--decimate', action='store_true', help='--ortho read tiles directly at --img-size resolution')
+    parser.add_argument('--min-valid', type=float, default=None, help='skip tiles below this valid-pixel fraction (--ortho, or tile folders with a tile_index.npz)')
+    parser.add_argument('--bands', nargs='+', type=int, default=None, help='--ortho RGB band indexes (1-based)')
+    parser.add_argument('--stretch', nargs=2, type=float, default=None, help='--ortho 8-bit stretch percentiles')
+    parser.add_argument('--min-texture', type=float, default=0.0, help='skip tiles with lower luma variance (--ortho, or tile folders with a tile_index.npz)')
+    parser.add_argument('--aoi', type=str, default='', help='--ortho only tile inside this area of interest (vector file)')
     opt = parser.parse_args()
     print(opt)
     #check_requirements(exclude=('pycocotools', 'thop'))
@@ -0,0 +1,76 @@
+"""
+
+File Name: export.py
+Origin: Netflora (https://github.com/NetFlora/Netflora)
+
+Usage:
+    $ python export.py --weights model_weights.pt --img-size 640
+    $ python detect.py --weights model_weights.onnx --backend onnxruntime --source processing/output_tiles
+
+"""
+
+import argparse
+import json
+from pathlib import Path
+
+import torch
+
+from models.experimental import attempt_load
+from models.yolo import Detect, IDetect
+from utils.general import check_img_size, set_logging
+
+
+def export_onnx(weights, f=None, img_size=640, opset=12, dynamic=True, simplify=False):
+    # Raw (pre-NMS) predictions of the fused FP32 model, the same tensor detect.py passes to
+    # non_max_suppression, so the Python NMS and label writing run unchanged on top of ONNX Runtime
+    import onnx  # only needed here
+
+    model = attempt_load(weights, map_location='cpu')  # load FP32 model
+    stride = int(model.stride.max())
+    img_size = check_img_size(img_size, s=stride)
+    for m in model.modules():
+        if isinstance(m, (Detect, IDetect)):
+            m.export, m.concat = False, True  # decoded boxes, single output
+            m.grid = [torch.zeros(1)] * m.nl  # grid rebuilt from the input shape in the graph, not baked in
+    model.eval()
+
+    img = torch.zeros(1, 3, img_size, img_size)
+    f = str(f or Path(weights).with_suffix('.onnx'))
+    axes = {'images': {0: 'batch', 2: 'height', 3: 'width'}, 'output': {0: 'batch', 1: 'anchors'}} if dynamic else None
+    torch.onnx.export(model, img, f, opset_version=opset, input_names=['images'], output_names=['output'],
+                      dynamic_axes=axes, do_constant_folding=True)
+
+    model_onnx = onnx.load(f)
+    onnx.checker.check_model(model_onnx)
+    if simplify:
+        import onnxsim  # only needed here
+        model_onnx, check = onnxsim.simplify(model_onnx)
+        assert check, 'onnx-simplifier check failed'
+    set_metadata(model_onnx, stride=json.dumps(model.stride.tolist()), names=json.dumps(model.names),
+                 img_size=str(img_size))
+    onnx.save(model_onnx, f)
+    print(f'ONNX export success, saved as {f} (opset {opset}, {"dynamic" if dynamic else "static"} shape)')
+    return f
+
+
+def set_metadata(model_onnx, **meta):
+    # Stride and class names travel with the graph; utils.onnx_backend.OnnxModel reads them back
+    del model_onnx.metadata_props[:]
+    for k, v in meta.items():
+        prop = model_onnx.metadata_props.add()
+        prop.key, prop.value = k, v
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--weights', type=str, default='model_weights.pt', help='model.pt path')
+    parser.add_argument('--output', type=str, default='', help='.onnx path (default: next to --weights)')
+    parser.add_argument('--img-size', type=int, default=640, help='example input size (pixels)')
+    parser.add_argument('--opset', type=int, default=12, help='ONNX opset version')
+    parser.add_argument('--static', action='store_true', help='fixed batch 1 and --img-size input')
+    parser.add_argument('--simplify', action='store_true', help='run onnx-simplifier on the graph')
+    opt = parser.parse_args()
+    print(opt)
+    set_logging()
+
+    export_onnx(opt.weights, opt.output or None, opt.img_size, opt.opset, not opt.static, opt.simplify)
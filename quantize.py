@@ -0,0 +1,189 @@
+"""
+
+File Name: quantize.py
+Origin: Netflora (https://github.com/NetFlora/Netflora)
+
+Usage:
+    $ python quantize.py --weights model_weights.pt --calib processing/output_tiles --data labeled/images
+    $ python detect.py --weights model_weights.int8.onnx --backend onnxruntime --source processing/output_tiles
+
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+import torch
+
+from export import export_onnx, set_metadata
+from utils.datasets import LoadImages, img2label_paths, letterbox
+from utils.general import box_iou, non_max_suppression, scale_coords, set_logging, xywhn2xyxy
+from utils.metrics import ap_per_class
+from utils.onnx_backend import OnnxModel
+
+try:
+    import onnxruntime.quantization as ortq
+except ImportError:
+    ortq = None
+
+
+class TileCalibration(ortq.CalibrationDataReader if ortq else object):
+    # Feeds a random sample of tiles, scaled as in detect.py, to the activation range calibration. Every tile is
+    # letterboxed to the full img_size square: the percentile and entropy calibrators stack all activations, so
+    # edge tiles padded only to a stride multiple would give them mismatched shapes
+    def __init__(self, source, input_name, img_size=640, stride=32, n=200, seed=0):
+        loader = LoadImages(source, img_size=img_size, stride=stride)
+        files = [f for f, video in zip(loader.files, loader.video_flag) if not video]
+        self.files = random.Random(seed).sample(files, min(n, len(files)))
+        self.input_name = input_name
+        self.img_size = img_size
+        self.iter = iter(self.files)
+
+    def get_next(self):
+        path = next(self.iter, None)
+        if path is None:
+            return None
+        img0 = np.load(path) if path.endswith('.npy') else cv2.imread(path)  # BGR
+        assert img0 is not None, 'Image Not Found ' + path
+        img = letterbox(img0, self.img_size, auto=False)[0]
+        img = img[:, :, ::-1].transpose(2, 0, 1)  # BGR to RGB, CHW
+        return {self.input_name: (np.ascontiguousarray(img[None], dtype=np.float32) / 255.0)}
+
+    def rewind(self):
+        self.iter = iter(self.files)
+
+
+def head_nodes(model_onnx):
+    # Nodes between the last convolutions and the graph output: the box decode works in pixels and the
+    # grid/anchor arithmetic loses whole pixels at 8 bits, so it stays in float
+    producer = {o: node for node in model_onnx.graph.node for o in node.output}
+    exclude, stack = set(), [o.name for o in model_onnx.graph.output]
+    while stack:
+        node = producer.get(stack.pop())
+        if node is None or node.op_type == 'Conv' or node.name in exclude:
+            continue
+        exclude.add(node.name)
+        stack.extend(node.input)
+    return sorted(exclude)
+
+
+def quantize(fp32_path, int8_path, calib, img_size=640, n_calib=200, method='percentile', per_channel=True):
+    # Static INT8 (QDQ) model: per-channel int8 weights, uint8 activations with ranges calibrated on tiles
+    import onnx  # only needed here
+    assert ortq is not None, 'quantize.py requires onnxruntime: pip install onnxruntime'
+
+    model_onnx = onnx.load(fp32_path)
+    for i, node in enumerate(model_onnx.graph.node):  # nodes_to_exclude matches by name
+        node.name = node.name or f'{node.op_type}_{i}'
+    meta = {p.key: p.value for p in model_onnx.metadata_props}
+    stride = int(max(json.loads(meta['stride'])))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        named = os.path.join(tmp, 'model.onnx')
+        onnx.save(model_onnx, named)
+        reader = TileCalibration(calib, model_onnx.graph.input[0].name, img_size, stride, n_calib)
+        print(f'Calibrating on {len(reader.files)} tiles from {calib} ({method})')
+        methods = {'minmax': ortq.CalibrationMethod.MinMax, 'entropy': ortq.CalibrationMethod.Entropy,
+                   'percentile': ortq.CalibrationMethod.Percentile}
+        ortq.quantize_static(named, int8_path, reader, quant_format=ortq.QuantFormat.QDQ,
+                             activation_type=ortq.QuantType.QUInt8, weight_type=ortq.QuantType.QInt8,
+                             per_channel=per_channel, calibrate_method=methods[method],
+                             nodes_to_exclude=head_nodes(model_onnx))
+
+    model_int8 = onnx.load(int8_path)
+    set_metadata(model_int8, **meta)  # stride/names for OnnxModel
+    onnx.save(model_int8, int8_path)
+    print(f'INT8 model saved as {int8_path}')
+    return int8_path
+
+
+def match(det, labels, iouv):
+    # Correct-prediction matrix (n, 10) at IoU thresholds iouv, each label matched at most once
+    correct = torch.zeros(det.shape[0], len(iouv), dtype=torch.bool)
+    detected = set()
+    tcls = labels[:, 0]
+    for cls in torch.unique(tcls):
+        ti = (cls == tcls).nonzero(as_tuple=False).view(-1)  # target indices
+        pi = (cls == det[:, 5]).nonzero(as_tuple=False).view(-1)  # prediction indices
+        if pi.shape[0]:
+            ious, i = box_iou(det[pi, :4], labels[ti, 1:]).max(1)  # best ious, indices
+            for j in (ious > iouv[0]).nonzero(as_tuple=False):
+                d = ti[i[j]].item()
+                if d not in detected:
+                    detected.add(d)
+                    correct[pi[j]] = ious[j] > iouv
+                    if len(detected) == len(labels):
+                        return correct
+    return correct
+
+
+def evaluate(model, source, img_size=640, conf_thres=0.001, iou_thres=0.65):
+    # mAP@0.5, mAP@0.5:0.95 and mean inference time (ms) on images with YOLO labels (images/ -> labels/)
+    stride = int(model.stride.max())
+    iouv = torch.linspace(0.5, 0.95, 10)
+    stats, t = [], 0.0
+    dataset = LoadImages(source, img_size=img_size, stride=stride)
+    for path, img, im0, _ in dataset:
+        img = torch.from_numpy(img).float()[None] / 255.0
+        t0 = time.time()
+        pred = model(img)[0]
+        t += time.time() - t0
+        det = non_max_suppression(pred, conf_thres, iou_thres)[0]
+        det[:, :4] = scale_coords(img.shape[2:], det[:, :4], im0.shape)
+
+        label_path = img2label_paths([path])[0]
+        labels = np.loadtxt(label_path, ndmin=2, dtype=np.float32) if os.path.isfile(label_path) else np.zeros((0, 5))
+        labels = torch.from_numpy(labels.reshape(-1, 5)).float()
+        labels[:, 1:] = xywhn2xyxy(labels[:, 1:], w=im0.shape[1], h=im0.shape[0])
+
+        correct = match(det, labels, iouv) if len(labels) else torch.zeros(det.shape[0], len(iouv), dtype=torch.bool)
+        stats.append((correct, det[:, 4], det[:, 5], labels[:, 0]))
+
+    stats = [torch.cat(x, 0).numpy() for x in zip(*stats)]
+    if len(stats) and stats[0].any():
+        _, _, ap, _, _ = ap_per_class(*stats)
+        map50, map = ap[:, 0].mean(), ap.mean()
+    else:
+        map50 = map = 0.0
+    return map50, map, 1E3 * t / max(1, len(dataset))
+
+
+def main(opt):
+    torch.set_num_threads(opt.threads)
+    fp32 = opt.weights if opt.weights.endswith('.onnx') else export_onnx(opt.weights, img_size=opt.img_size)
+    int8 = opt.output or str(Path(fp32).with_suffix('.int8.onnx'))
+    quantize(fp32, int8, opt.calib, opt.img_size, opt.calib_size, opt.method, not opt.per_tensor)
+
+    if opt.data:
+        print(f"\n{'model':<8}{'mAP@.5':>10}{'mAP@.5:.95':>12}{'ms/img':>10}")
+        results = {}
+        for name, path in (('fp32', fp32), ('int8', int8)):
+            results[name] = evaluate(OnnxModel(path, threads=opt.threads), opt.data, opt.img_size)
+            print(f'{name:<8}{results[name][0]:>10.4f}{results[name][1]:>12.4f}{results[name][2]:>10.1f}')
+        (a50, a, ta), (b50, b, tb) = results['fp32'], results['int8']
+        print(f'drift: mAP@.5 {b50 - a50:+.4f}, mAP@.5:.95 {b - a:+.4f}, speedup {ta / tb:.2f}x')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--weights', type=str, default='model_weights.pt', help='model.pt or exported FP32 .onnx')
+    parser.add_argument('--output', type=str, default='', help='INT8 .onnx path (default: <weights>.int8.onnx)')
+    parser.add_argument('--calib', type=str, default='processing/output_tiles', help='calibration tile folder')
+    parser.add_argument('--calib-size', type=int, default=200, help='tiles sampled for calibration')
+    parser.add_argument('--method', type=str, default='percentile', choices=['minmax', 'entropy', 'percentile'],
+                        help='activation range calibration')
+    parser.add_argument('--per-tensor', action='store_true', help='per-tensor instead of per-channel weights')
+    parser.add_argument('--data', type=str, default='', help='labeled images/ folder for the FP32 vs INT8 mAP')
+    parser.add_argument('--img-size', type=int, default=640, help='inference size (pixels)')
+    parser.add_argument('--threads', type=int, default=os.cpu_count(), help='intra-op threads')
+    opt = parser.parse_args()
+    print(opt)
+    set_logging()
+
+    main(opt)
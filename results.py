@@ -18,6 +18,7 @@ import matplotlib.pyplot as plt
 from shapely.geometry import box
 from pathlib import Path
 from IPython.display import Image, display
+from utils.tile_index import TileIndex
 
 
 with open('processing/variable.json', 'r', encoding='utf-8') as file:
@@ -30,12 +31,20 @@ with open('json/groups.json', 'r', encoding='utf-8') as file:
         species_dict = data['species_dict']
         categories = data['categories']
 
-coords = pd.read_csv("processing/tile_coords.csv")
+tile_index_path = "processing/tile_index.npz"
+tile_coords_path = "processing/tile_coords.csv"
 base_path = "runs/detect/"
 output_shapefile_directory = "results/shapefiles/"
 output_csv_directory = "results/csv/"
 output_dir = "results/"
 
+def load_tile_bounds():
+    # filename -> (minX, minY, maxX, maxY), from the tile index or a legacy tile_coords.csv
+    if os.path.exists(tile_index_path):
+        return TileIndex.load(tile_index_path)
+    coords = pd.read_csv(tile_coords_path)
+    return dict(zip(coords['filename'], coords[['minX', 'minY', 'maxX', 'maxY']].itertuples(index=False, name=None)))
+
 def map_species_names(df, species_dict):
     df['common_name'] = df['class_id'].map(lambda x: species_dict[x]['common_name'] if x in species_dict else 'Desconhecido')
     return df
@@ -203,15 +212,16 @@ def main():
     arquivos_txt = glob.glob(os.path.join(pasta_labels, "*.txt"))
 
     data = []
+    tile_bounds = load_tile_bounds()
 
     for arquivo_txt in arquivos_txt:
         filename = os.path.basename(arquivo_txt)[:-4] + ".jpg"
-        if filename not in coords['filename'].values:
-            print(f"Coordinates not found for {filename} in the CSV. Skipping.")
+        bounds = tile_bounds.get(filename)
+        if bounds is None:
+            print(f"Coordinates not found for {filename} in the tile index. Skipping.")
             continue
 
-        coords_row = coords[coords['filename'] == filename].iloc[0]
-        utm_xmin, utm_ymin, utm_xmax, utm_ymax = coords_row[['minX', 'minY', 'maxX', 'maxY']]
+        utm_xmin, utm_ymin, utm_xmax, utm_ymax = bounds
         utm_width = utm_xmax - utm_xmin
         utm_height = utm_ymax - utm_ymin
 
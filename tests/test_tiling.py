@@ -0,0 +1,70 @@
+"""
+
+File Name: test_tiling.py
+Origin: Netflora (https://github.com/NetFlora/Netflora)
+
+Usage:
+    $ python -m pytest tests
+
+"""
+
+import ctypes
+
+import numpy as np
+import pytest
+
+rasterio = pytest.importorskip('rasterio')
+
+from utils.tiling import GDAL_CACHE_MIN, gdal_cache_mb, gdal_env
+
+
+def libgdal():
+    # The libgdal rasterio itself loaded (wheels bundle their own copy), found through the process maps
+    try:
+        with open('/proc/self/maps') as f:
+            paths = {line.split()[-1] for line in f if 'libgdal' in line.split()[-1]}
+    except OSError:
+        paths = set()
+    if not paths:
+        pytest.skip('libgdal not found in the process maps')
+    lib = ctypes.CDLL(sorted(paths)[0])
+    lib.GDALGetCacheMax64.restype = ctypes.c_int64
+    return lib
+
+
+@pytest.fixture
+def raster(tmp_path):
+    path = str(tmp_path / 'ortho.tif')
+    profile = dict(driver='GTiff', width=1024, height=1024, count=3, dtype='uint8', tiled=True, blockxsize=256,
+                   blockysize=256)
+    with rasterio.open(path, 'w', **profile) as dst:
+        dst.write(np.ones((3, 1024, 1024), dtype=np.uint8))
+    return path
+
+
+@pytest.mark.parametrize('gdal_cache', [None, 90])
+def test_gdal_env_cache_is_megabytes(raster, gdal_cache):
+    lib = libgdal()
+    with rasterio.open(raster) as src:
+        mb = gdal_cache or gdal_cache_mb(src, 512, 64)
+        with rasterio.Env(**gdal_env(src, 512, 64, gdal_cache=gdal_cache)):
+            assert lib.GDALGetCacheMax64() == mb * 2 ** 20
+
+
+def test_gdal_env_zero_keeps_default(raster):
+    with rasterio.open(raster) as src:
+        assert gdal_env(src, 512, 64, gdal_cache=0) == {}
+
+
+def test_gdal_env_block_reader_minimal(tmp_path):
+    path = str(tmp_path / 'wide.tif')  # a tile row band above the floor, pixels never written
+    with rasterio.open(path, 'w', driver='GTiff', width=32768, height=512, count=3, dtype='uint8', tiled=True,
+                       blockxsize=256, blockysize=256):
+        pass
+    with rasterio.open(path) as src:
+        sized = gdal_cache_mb(src, 512, 64) * 2 ** 20
+        assert sized > GDAL_CACHE_MIN * 2 ** 20
+        assert gdal_env(src, 512, 64, reader='block')['GDAL_CACHEMAX'] == GDAL_CACHE_MIN * 2 ** 20
+        assert gdal_env(src, 512, 64, reader='block', out_size=256)['GDAL_CACHEMAX'] == sized  # decimated reads
+        assert gdal_env(src, 512, 64, reader='threads')['GDAL_CACHEMAX'] == sized
+        assert gdal_env(src, 512, 64, gdal_cache=90, reader='block')['GDAL_CACHEMAX'] == 90 * 2 ** 20
@@ -0,0 +1,98 @@
+"""
+
+File Name: test_weights.py
+Origin: Netflora (https://github.com/NetFlora/Netflora)
+
+Usage:
+    $ python -m pytest tests
+
+"""
+
+import hashlib
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip('requests')
+
+from utils.weights import WeightsManager
+
+PAYLOAD = os.urandom(3 * (1 << 20) + 123)  # several download chunks
+DIGEST = hashlib.sha256(PAYLOAD).hexdigest()
+
+
+class Handler(BaseHTTPRequestHandler):
+    # Serves PAYLOAD with Range support; the first `drops` full-body responses stop halfway and close
+    drops = 0
+    ranges = []
+
+    def do_GET(self):
+        rng = self.headers.get('Range')
+        type(self).ranges.append(rng)
+        start = int(rng[len('bytes='):].rstrip('-')) if rng else 0
+        body = PAYLOAD[start:]
+        self.send_response(206 if rng else 200)
+        if rng:
+            self.send_header('Content-Range', f'bytes {start}-{len(PAYLOAD) - 1}/{len(PAYLOAD)}')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if type(self).drops:
+            type(self).drops -= 1
+            self.wfile.write(body[:len(body) // 2])
+            self.wfile.flush()
+            self.close_connection = True
+            self.connection.shutdown(2)  # connection lost mid-body
+            return
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    Handler.drops, Handler.ranges = 0, []
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{httpd.server_address[1]}/assets/model.pt'
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_resume_after_dropped_connection(server, tmp_path):
+    Handler.drops = 1
+    path = WeightsManager(tmp_path, retries=3).fetch(server, 'PMFS', sha256=DIGEST)
+    assert path.read_bytes() == PAYLOAD
+    assert Handler.ranges[0] is None and Handler.ranges[1].startswith('bytes=')
+    assert 0 < int(Handler.ranges[1][len('bytes='):-1]) <= len(PAYLOAD) // 2  # resumed from the .part file
+    assert not os.path.exists(f'{path}.part')
+
+
+def test_checksum_mismatch(server, tmp_path):
+    manager = WeightsManager(tmp_path)
+    with pytest.raises(ValueError, match='Checksum mismatch'):
+        manager.fetch(server, 'PMFS', sha256='0' * 64)
+    assert not any(tmp_path.rglob('model.pt*'))  # nothing cached or left to resume
+
+
+def test_reuse_across_algorithms_and_corruption(server, tmp_path):
+    manager = WeightsManager(tmp_path)
+    first = manager.fetch(server, 'PMFS', sha256=DIGEST)
+    second = manager.fetch(server, 'PFNMs', sha256=DIGEST)
+    assert second != first and second.read_bytes() == PAYLOAD
+    assert len(Handler.ranges) == 1  # served from the PMFS entry
+
+    out = tmp_path / 'model_weights.pt'
+    manager.install(server, out, 'PMFS', sha256=DIGEST)
+    with open(out, 'r+b') as f:  # an installed copy is not the cache entry
+        f.write(b'\0' * 16)
+    assert manager.fetch(server, 'PMFS', sha256=DIGEST).read_bytes() == PAYLOAD
+    assert len(Handler.ranges) == 1
+
+    with open(first, 'r+b') as f:  # corrupted cache entry: re-downloaded
+        f.write(b'\0' * 16)
+    assert manager.fetch(server, 'PMFS', sha256=DIGEST).read_bytes() == PAYLOAD
+    assert len(Handler.ranges) == 2
@@ -5,40 +5,40 @@ Origin: Netflora (hhttps://github.com/NetFlora/Netflora)
 
 """
 
-import ipywidgets as widgets
-from IPython.display import display, clear_output, HTML
-import rasterio
-from rasterio.windows import Window
-from utils.credentials import credentials
-from PIL import Image
-import numpy as np
-import pandas as pd
-import shutil
-from tqdm.notebook import tqdm
-import requests
-import os
-import csv
+from utils.tiling import SPECS, create_tiles, main, parse_opt, run_tiling, select_samples, tif_center
+from utils.tile_cache import TileCache
 import json
+import os
+
+# Notebook interface only: ipywidgets, IPython, utils.credentials (google.colab) and tqdm.notebook are imported
+# on use, so the tiling engine (utils/tiling.py) and `python tiles.py --algorithm ... --source ...` run headless.
 
 
+def index_beside(path):
+    # tile_index.npz in the folder of path (tile_coords.csv or output_tiles), where run_tiling writes it
+    return os.path.join(os.path.dirname(os.path.normpath(path)), 'tile_index.npz')
+
 
 class TileGenerator:
-    def __init__(self):
+    def __init__(self, workers=1, min_valid=None, out_size=None, cache=True, cache_dir=None, aoi=None, ui=True):
         self.verified = False
+        self.workers = workers
+        self.min_valid = min_valid
+        self.out_size = out_size
+        self.aoi = aoi  # area of interest vector file, tiles outside it are skipped
+        self.tile_cache = TileCache(cache_dir) if cache else None
+        self.weights = None  # WeightsManager (and its HTTP session), created on first use and reused
         self.attempted_verification = False
         self.crs = None
-        self.specs = {
-            'Açaí': {'name': 'Acai', 'size': 1536, 'overlap': 128, 'link': 'https://github.com/NetFlora/Netflora/releases/download/Assets/ACAI_Embrapa00.pt'},
-            'Palmeiras': {'name': 'Palmeiras', 'size': 1536, 'overlap': 256,'link': 'https://github.com/NetFlora/Netflora/releases/download/Assets/PALMEIRAS_Embrapa00.pt'},
-            'Castanheira': {'name': 'Castanheira', 'size': 2048, 'overlap': 1024, 'link': None},
-            'PMFS': {'name': 'PMFS', 'size': 1536, 'overlap': 768, 'link': 'https://github.com/NetFlora/Netflora/releases/download/Assets/PMFS_Embrapa00.pt'},
-            'PFNMs': {'name': 'PFNMs', 'size': 1536, 'overlap': 512, 'link': 'https://github.com/NetFlora/Netflora/releases/download/Assets/NM_Embrapa00.pt'},
-            'Ecológico': {'name': 'Ecologico', 'size': 3000, 'overlap': 0, 'link': None},
-        }
-        self.setup_ui()
-        self.verify()
+        self.specs = SPECS
+        if ui:
+            self.setup_ui()
+            self.verify()
 
     def verify(self):
+        from IPython.display import display, HTML
+        from utils.credentials import credentials
+
         if self.attempted_verification:
             return self.verified
         self.attempted_verification = True
@@ -70,97 +70,48 @@ class TileGenerator:
         self.button.disabled = False
 
 
-    def download_model_weights(self, url, output_path):
+    def weights_manager(self):
+        if self.weights is None:
+            from utils.weights import WeightsManager  # requests, only needed here
+            self.weights = WeightsManager()
+        return self.weights
+
+    def download_model_weights(self, url, output_path, algorithm='', sha256=None):
         if url is not None:
-            response = requests.get(url)
-            with open(output_path, 'wb') as f:
-                f.write(response.content)
+            self.weights_manager().install(url, output_path, algorithm=algorithm, sha256=sha256)
             
 
-    def create_tiles_with_overlap_and_save_coords(self, image_path, tile_size, overlap, output_dir, csv_path):
-        if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
-
-        tile_counter = 0
-
-        with rasterio.open(image_path) as src:
-            self.crs = src.crs
-            with open(csv_path, mode='w', newline='') as file:
-                writer = csv.writer(file)
-                writer.writerow(['filename', 'minX', 'minY', 'maxX', 'maxY', 'crs'])
-
-                width, height = src.width, src.height
-                total_tiles = ((height - overlap) // (tile_size - overlap)) * ((width - overlap) // (tile_size - overlap))
-
-                pbar_creation = tqdm(total=total_tiles, desc="Creating Tiles")
-
-                for i in range(0, height, tile_size - overlap):
-                    for j in range(0, width, tile_size - overlap):
-                        w = min(tile_size, width - j)
-                        h = min(tile_size, height - i)
-                        window = Window(j, i, w, h)
-                        transform = src.window_transform(window)
-                        tile = src.read(window=window)
-
-                        if np.any(tile):
-                            if tile.shape[0] == 4:
-                                tile_image = Image.fromarray(np.moveaxis(tile, 0, -1)).convert('RGB')
-                            else:
-                                tile_image = Image.fromarray(np.moveaxis(tile, 0, -1))
-
-                            tile_filename = f'tile_{tile_counter}.jpg'
-                            tile_image.save(os.path.join(output_dir, tile_filename), 'JPEG')
-
-                            bounds = rasterio.transform.array_bounds(h, w, transform)
-                            writer.writerow([tile_filename, bounds[0], bounds[1], bounds[2], bounds[3], str(self.crs)])
-
-                            tile_counter += 1
-
-                        pbar_creation.update(1)
-
-                pbar_creation.close()
-
-        pbar_verification = tqdm(total=tile_counter, desc="Processing Tiles")
-        for _ in os.listdir(output_dir):
-            pbar_verification.update(1)
-        pbar_verification.close()
-
+    def create_tiles_with_overlap_and_save_coords(self, image_path, tile_size, overlap, output_dir, csv_path=None, reader='window', cache_blocks=None, workers=None, min_valid=None, out_size=None, *, index_path=None):
+        from tqdm.notebook import tqdm
+        index_path = index_path or index_beside(csv_path or output_dir)
+        tile_counter, self.crs = create_tiles(image_path, tile_size, overlap, output_dir, index_path, csv_path, reader=reader,
+                                              cache_blocks=cache_blocks, progress=tqdm, **self.tiling_options(workers, min_valid, out_size))
         return tile_counter
 
+    def tiling_options(self, workers=None, min_valid=None, out_size=None):
+        return dict(workers=self.workers if workers is None else workers,
+                    min_valid=self.min_valid if min_valid is None else min_valid,
+                    out_size=self.out_size if out_size is None else out_size,
+                    cache=self.tile_cache, aoi=self.aoi)
+
     def get_tif_center(self, image_path):
-        with rasterio.open(image_path) as tif:
-            center_x = (tif.bounds.left + tif.bounds.right) / 2
-            center_y = (tif.bounds.top + tif.bounds.bottom) / 2
-        return center_x, center_y
+        return tif_center(image_path)
 
 
-    def find_closest_images(self, csv_path, center, max_distance=100, max_images=5, images_folder='output_tiles', output_folder='processing/selected_images'):
+    def find_closest_images(self, csv_path, center, max_distance=100, max_images=5, images_folder='output_tiles', output_folder='processing/selected_images', strategy='nearest', link='hardlink', *, index_path=None):
+        # csv_path: tile_coords.csv of create_tiles_with_overlap_and_save_coords, its tile index is read from beside it
+        index_path = index_path or (csv_path if csv_path.endswith('.npz') else index_beside(csv_path))
+        selected = select_samples(index_path, center, max_distance, max_images, images_folder, output_folder, strategy, link)
+        print(f"{len(selected)} imagens foram selecionadas em {output_folder}.")
         
-        df = pd.read_csv(csv_path)
-
-        
-        df['center_x'] = (df['minX'] + df['maxX']) / 2
-        df['center_y'] = (df['minY'] + df['maxY']) / 2
-
-        distances = np.sqrt((df['center_x'] - center[0]) ** 2 + (df['center_y'] - center[1]) ** 2)
-        df['distance'] = distances
-
-        closest_images = df[df['distance'] <= max_distance].nsmallest(max_images, 'distance')
-
-        if not os.path.exists(output_folder):
-            os.makedirs(output_folder)
-
-        for _, row in closest_images.iterrows():
-            image_path = os.path.join(images_folder, row['filename'])
-            output_image_path = os.path.join(output_folder, row['filename'])
-            if os.path.exists(image_path):
-                shutil.copy(image_path, output_image_path)
-            else:
-                print(f"A imagem {row['filename']} não foi encontrada em {images_folder}.")
+    def log(self, msg, color=None):
+        from IPython.display import display, HTML
+        display(HTML(f'<span style="color: {color};">{msg}</span>' if color else msg))
 
-        print(f"{len(closest_images)} imagens foram copiadas para {output_folder}.")
-        
     def setup_ui(self):
+        import ipywidgets as widgets
+        from IPython.display import display
+
         self.image_path_text = widgets.Text(
             value='',
             placeholder='Insira o caminho da ortofoto aqui',
@@ -185,7 +136,8 @@ class TileGenerator:
         display(self.image_path_text, self.dropdown, self.button, self.output)
         
     def on_algorithm_change(self, change):
-       
+        from IPython.display import display, clear_output, HTML
+
         with self.output:
             clear_output(wait=True)
             if change['new'] == 'Selecione':
@@ -196,6 +148,9 @@ class TileGenerator:
                 display(HTML(f'<span style="color: blue;">O algoritmo {change["new"]} foi selecionado.</span>'))
 
     def on_button_clicked(self, b):
+      from IPython.display import display, clear_output, HTML
+      from tqdm.notebook import tqdm
+
       with self.output:
         clear_output()
         if self.dropdown.value == 'Selecione':
@@ -208,30 +163,10 @@ class TileGenerator:
                 
                 display(HTML(f'<span style="color: orange;">O algoritmo {selected_spec["name"]} está em fase de desenvolvimento. Estamos trabalhando para disponibilizá-lo em breve. Fique atento(a) às próximas atualizações!</span>'))
             else:
-                
-                image_path = self.image_path_text.value
-                output_dir = 'processing/output_tiles'
-                csv_path = 'processing/tile_coords.csv'
-                
-                model_weights_path = 'model_weights.pt'
-                display(HTML('<span style="color: orange;">Carregando algoritmo...</span>'))
-                self.download_model_weights(selected_spec['link'], model_weights_path)
-                display(HTML('<span style="color: green;">O algoritmo foi carregado com sucesso.</span>'))
-
-                num_tiles = self.create_tiles_with_overlap_and_save_coords(image_path, selected_spec['size'], selected_spec['overlap'], output_dir, csv_path)
-                display(HTML(f'<span style="color: green;">Número total de tiles criados: {num_tiles}</span>'))
-
-                center = self.get_tif_center(image_path)
-                self.find_closest_images(csv_path, center, max_distance=100, max_images=5, images_folder=output_dir, output_folder='processing/selected_images')
-
-                variables = {
-                    'crs': str(self.crs),
-                    'algorithm': self.dropdown.value,
-                    'tile_size': selected_spec['size'],
-                    'overlap': selected_spec['overlap']
-                }
+                variables = run_tiling(self.dropdown.value, self.image_path_text.value, 'processing', 'model_weights.pt',
+                                       weights=self.weights_manager(), log=self.log, progress=tqdm, **self.tiling_options())
+                self.crs = variables['crs']
 
-                with open('processing/variable.json', 'w') as f:
 
-                    json.dump(variables, f, indent=4)
- 
+if __name__ == '__main__':
+    main(parse_opt())
@@ -0,0 +1,61 @@
+"""
+
+File Name: aoi.py
+Origin: Netflora (https://github.com/NetFlora/Netflora)
+
+"""
+
+import geopandas as gpd
+import numpy as np
+from rasterio.features import geometry_mask
+from rasterio.windows import bounds as window_bounds
+from shapely.geometry import box
+from shapely.ops import unary_union
+from shapely.prepared import prep
+from shapely.strtree import STRtree
+
+
+class AOI:
+    # Area of interest (GeoPackage, shapefile, ...) in the raster CRS. Tile windows are tested against an
+    # STRtree of its polygons, and the pixels of partially covered tiles outside it are zeroed (nodata).
+    def __init__(self, path, src, layer=None):
+        gdf = gpd.read_file(path, layer=layer)
+        if gdf.crs is not None and src.crs is not None:
+            gdf = gdf.to_crs(src.crs)
+        self.path = path
+        self.transform = src.transform
+        self.geoms = [g for g in gdf.geometry if g is not None and not g.is_empty]
+        assert self.geoms, f'AOI {path} has no geometries'
+        self._build()
+
+    def _build(self):
+        self.tree = STRtree(self.geoms)
+        self.inside = prep(unary_union(self.geoms))
+
+    def __getstate__(self):  # STRtree and prepared geometries are rebuilt in worker processes
+        return {k: v for k, v in self.__dict__.items() if k not in ('tree', 'inside')}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._build()
+
+    def query(self, window):
+        # AOI polygons intersecting the window's footprint
+        footprint = box(*window_bounds(window, self.transform))
+        hits = self.tree.query(footprint)
+        geoms = [self.geoms[i] for i in hits] if len(hits) and np.issubdtype(np.asarray(hits).dtype, np.integer) \
+            else list(hits)  # shapely >= 2 returns indices, 1.x geometries
+        return [g for g in geoms if g.intersects(footprint)], footprint
+
+    def filter(self, windows):
+        # Keeps windows that intersect the AOI
+        return [w for w in windows if self.query(w)[0]]
+
+    def clip(self, tile, window, transform):
+        # Zeroes, in place, the pixels of a tile (covering window, with affine transform) outside the AOI
+        geoms, footprint = self.query(window)
+        if not geoms:
+            tile[:] = 0
+        elif not self.inside.contains(footprint):
+            tile[:, geometry_mask(geoms, out_shape=tile.shape[-2:], transform=transform)] = 0
+        return tile
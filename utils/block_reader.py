@@ -0,0 +1,115 @@
+"""
+
+File Name: block_reader.py
+Origin: Netflora (https://github.com/NetFlora/Netflora)
+
+"""
+
+import math
+from collections import OrderedDict
+from itertools import groupby
+
+import numpy as np
+from rasterio.windows import Window
+
+
+class BlockCache:
+    # Bounded LRU of decoded raster blocks keyed by (block_row, block_col)
+    def __init__(self, maxsize):
+        self.maxsize = max(1, int(maxsize))
+        self.blocks = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        block = self.blocks.get(key)
+        if block is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.blocks.move_to_end(key)
+        return block
+
+    def put(self, key, block):
+        self.blocks[key] = block
+        self.blocks.move_to_end(key)
+        while len(self.blocks) > self.maxsize:
+            self.blocks.popitem(last=False)
+
+    def clear(self):
+        self.blocks.clear()
+
+    def __len__(self):
+        return len(self.blocks)
+
+
+class BlockReader:
+    # Assembles arbitrary windows from the raster's internal blocks, decoding each block once
+    def __init__(self, src, tile_size=None, cache_blocks=None):
+        self.src = src
+        self.block_h, self.block_w = src.block_shapes[0]
+        self.n_block_rows = math.ceil(src.height / self.block_h)
+        self.n_block_cols = math.ceil(src.width / self.block_w)
+        self.dtype = np.dtype(src.dtypes[0])
+        if cache_blocks is None:
+            cache_blocks = self.band_capacity(tile_size or self.block_h)
+        self.cache = BlockCache(cache_blocks)
+        self.bytes_decoded = 0
+        self.blocks_decoded = 0
+
+    def band_capacity(self, tile_size):
+        # Blocks covering one full-width row of tiles, so vertical overlap is served from cache
+        return (math.ceil(tile_size / self.block_h) + 1) * self.n_block_cols
+
+    def block_window(self, bi, bj):
+        x, y = bj * self.block_w, bi * self.block_h
+        return Window(x, y, min(self.block_w, self.src.width - x), min(self.block_h, self.src.height - y))
+
+    def block(self, bi, bj):
+        key = (bi, bj)
+        data = self.cache.get(key)
+        if data is None:
+            data = self.src.read(window=self.block_window(bi, bj))
+            self.bytes_decoded += data.nbytes
+            self.blocks_decoded += 1
+            self.cache.put(key, data)
+        return data
+
+    def block_range(self, window):
+        col_off, row_off = int(window.col_off), int(window.row_off)
+        w, h = int(window.width), int(window.height)
+        rows = range(row_off // self.block_h, (row_off + h - 1) // self.block_h + 1)
+        cols = range(col_off // self.block_w, (col_off + w - 1) // self.block_w + 1)
+        return rows, cols
+
+    def prefetch(self, window):
+        # Decode every block under the window in internal block order
+        rows, cols = self.block_range(window)
+        for bi in rows:
+            for bj in cols:
+                self.block(bi, bj)
+
+    def read(self, window):
+        col_off, row_off = int(window.col_off), int(window.row_off)
+        w, h = int(window.width), int(window.height)
+        out = np.empty((self.src.count, h, w), dtype=self.dtype)
+        rows, cols = self.block_range(window)
+        for bi in rows:
+            by = bi * self.block_h
+            y0, y1 = max(row_off, by), min(row_off + h, by + self.block_h)
+            for bj in cols:
+                bx = bj * self.block_w
+                x0, x1 = max(col_off, bx), min(col_off + w, bx + self.block_w)
+                out[:, y0 - row_off:y1 - row_off, x0 - col_off:x1 - col_off] = \
+                    self.block(bi, bj)[:, y0 - by:y1 - by, x0 - bx:x1 - bx]
+        return out
+
+    def iter_tiles(self, windows):
+        # Streams a row-major tile grid: each tile row's band is decoded in block order, then cut into tiles
+        for row_off, row in groupby(windows, key=lambda w: int(w.row_off)):
+            row = list(row)
+            x0 = min(int(w.col_off) for w in row)
+            x1 = max(int(w.col_off + w.width) for w in row)
+            self.prefetch(Window(x0, row_off, x1 - x0, max(int(w.height) for w in row)))
+            for window in row:
+                yield window, self.read(window)
@@ -0,0 +1,108 @@
+"""
+
+File Name: checkpoint.py
+Origin: Netflora (https://github.com/NetFlora/Netflora)
+
+"""
+
+import json
+import os
+
+import numpy as np
+from PIL import Image
+
+from utils.tile_index import TileIndex
+
+FSYNC_EVERY = 64
+
+
+def tile_complete(path, decode=False):
+    # A tile is complete if it exists, is non-empty and (optionally) fully decodes
+    try:
+        if os.path.getsize(path) == 0:
+            return False
+        if decode and path.endswith('.npy'):
+            np.load(path)
+        elif decode:
+            with Image.open(path) as im:
+                im.load()
+        return True
+    except Exception:
+        return False
+
+
+class TilingCheckpoint:
+    # Append-only progress log of a tiling run. The first line identifies the inputs, then one line per
+    # finished grid window, {"w": window number, "t": tile id or null}, written after the tile file has been
+    # renamed into place, with the tile statistics {"s": [valid, mean, texture]}. Replaying it rebuilds the
+    # tile index and tells where to continue.
+    def __init__(self, path, ident):
+        self.path = path
+        self.ident = ident
+        self.file = None
+        self.pending = 0
+
+    def load(self, output_dir, ext='jpg', verify_last=16):
+        # Returns the (window, tile_id, stats) entries of an interrupted run with the same inputs, [] otherwise.
+        # Every recorded tile must exist; the last verify_last tiles must also decode completely.
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                lines = f.read().splitlines()
+            if not lines or json.loads(lines[0]) != self.ident:
+                return []
+        except (FileNotFoundError, json.JSONDecodeError):
+            return []
+
+        entries, n_tiles = [], 0
+        for line in lines[1:]:
+            try:
+                e = json.loads(line)
+            except json.JSONDecodeError:  # torn last line
+                break
+            if e['w'] != len(entries) or e['t'] not in (None, n_tiles):
+                break
+            entries.append((e['w'], e['t'], e.get('s')))
+            n_tiles += e['t'] is not None
+
+        tiles = [(i, t) for i, (_, t, _) in enumerate(entries) if t is not None]
+        for n, (i, t) in enumerate(tiles):
+            if not tile_complete(os.path.join(output_dir, TileIndex.filename(t, ext)), decode=n >= len(tiles) - verify_last):
+                return entries[:i]
+        return entries
+
+    def open(self, entries=()):
+        # Rewrites the log with the kept entries (dropping any torn tail) and keeps it open for appends.
+        # Temporary tiles of the interrupted run (worker .band* names, unrenamed writer .tmp files) are removed.
+        output_dir = os.path.dirname(self.path) or '.'
+        for name in os.listdir(output_dir):
+            if name.startswith('.band') or (name.startswith('tile_') and name.endswith('.tmp')):
+                os.remove(os.path.join(output_dir, name))
+        tmp = f'{self.path}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(self.ident) + '\n')
+            for w, t, stats in entries:
+                self._write(f, w, t, stats)
+        os.replace(tmp, self.path)
+        self.file = open(self.path, 'a', encoding='utf-8')
+
+    @staticmethod
+    def _write(f, window, tile_id, stats=None):
+        e = {'w': window, 't': tile_id}
+        if stats is not None:
+            e['s'] = [float(v) for v in stats]
+        f.write(json.dumps(e) + '\n')
+
+    def record(self, window, tile_id, stats=None):
+        self._write(self.file, window, tile_id, stats)
+        self.file.flush()
+        self.pending += 1
+        if self.pending >= FSYNC_EVERY:
+            os.fsync(self.file.fileno())
+            self.pending = 0
+
+    def close(self, remove=False):
+        if self.file:
+            self.file.close()
+            self.file = None
+        if remove and os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,94 @@
+"""
+
+File Name: coverage.py
+Origin: Netflora (https://github.com/NetFlora/Netflora)
+
+"""
+
+import math
+
+import numpy as np
+from rasterio.enums import MaskFlags, Resampling
+
+
+def valid_mask(src, data, window=None, out_shape=None):
+    # Valid pixels of data read from src: the dataset mask with alpha, nodata or an internal mask, else any
+    # non-zero band, the same criterion as the np.any empty tile check
+    if all(MaskFlags.all_valid in flags for flags in src.mask_flag_enums):
+        return np.any(data, axis=0)
+    return src.dataset_mask(window=window, out_shape=out_shape, resampling=Resampling.nearest) > 0
+
+
+def lowres_shape(src, max_side=1024):
+    scale = max(1.0, max(src.width, src.height) / max_side)
+    return max(1, math.ceil(src.height / scale)), max(1, math.ceil(src.width / scale))
+
+
+def lowres_read(src, bands=None, max_side=1024):
+    # (CHW data, valid mask) of src at most max_side pixels wide, or None without overviews: a decimated read
+    # then still decodes every full-resolution block, which costs more than tiling itself
+    bands = list(bands or range(1, src.count + 1))
+    if not src.overviews(bands[0]):
+        return None
+    out_h, out_w = lowres_shape(src, max_side)
+    data = src.read(bands, out_shape=(len(bands), out_h, out_w), resampling=Resampling.nearest)
+    return data, valid_mask(src, data, out_shape=(out_h, out_w))
+
+
+def sample_read(src, bands=None, max_side=1024):
+    # Pixel sample of src for statistics, (bands x N data, N valid mask): the low-resolution read when there
+    # are overviews, else about as many pixels from full-resolution blocks spread evenly over the raster
+    read = lowres_read(src, bands, max_side)
+    if read is not None:
+        data, valid = read
+        return data.reshape(len(data), -1), valid.ravel()
+    bands = list(bands or range(1, src.count + 1))
+    blocks = [w for _, w in src.block_windows(bands[0])]
+    block_h, block_w = src.block_shapes[bands[0] - 1]
+    n = min(len(blocks), max(16, max_side * max_side // (block_h * block_w)))
+    data, valid = [], []
+    for i in np.linspace(0, len(blocks) - 1, n).round().astype(int):
+        d = src.read(bands, window=blocks[i])
+        data.append(d.reshape(len(bands), -1))
+        valid.append(valid_mask(src, d, window=blocks[i]).ravel())
+    return np.concatenate(data, axis=1), np.concatenate(valid)
+
+
+class CoverageGrid:
+    # Low-resolution valid-pixel map of a raster, used to skip nodata collar before any full-resolution read
+    def __init__(self, valid, height, width):
+        out_h, out_w = valid.shape
+        self.sy, self.sx = height / out_h, width / out_w
+        self.valid = valid
+        self.sat = np.zeros((out_h + 1, out_w + 1), dtype=np.int64)  # summed-area table
+        self.sat[1:, 1:] = valid.cumsum(0).cumsum(1)
+
+    @classmethod
+    def from_dataset(cls, src, max_side=1024):
+        # From overviews, or from an internal mask band (one byte per pixel, no image decode); None when the map
+        # would need every image block decoded, callers then check tiles one by one
+        read = lowres_read(src, max_side=max_side)
+        if read is not None:
+            return cls(read[1], src.height, src.width)
+        if all(flags == [MaskFlags.per_dataset] for flags in src.mask_flag_enums):
+            out_h, out_w = lowres_shape(src, max_side)
+            valid = src.dataset_mask(out_shape=(out_h, out_w), resampling=Resampling.nearest) > 0
+            return cls(valid, src.height, src.width)
+        return None
+
+    def fraction(self, window):
+        # Valid-pixel fraction of a full-resolution window
+        y0, y1 = int(window.row_off // self.sy), math.ceil((window.row_off + window.height) / self.sy)
+        x0, x1 = int(window.col_off // self.sx), math.ceil((window.col_off + window.width) / self.sx)
+        y1, x1 = min(max(y1, y0 + 1), self.valid.shape[0]), min(max(x1, x0 + 1), self.valid.shape[1])
+        n = self.sat[y1, x1] - self.sat[y0, x1] - self.sat[y1, x0] + self.sat[y0, x0]
+        return n / ((y1 - y0) * (x1 - x0))
+
+    def filter(self, windows, min_valid=0.0):
+        # Keeps windows with some coverage and a valid fraction of at least min_valid
+        keep = []
+        for window in windows:
+            f = self.fraction(window)
+            if f > 0 and f >= min_valid:
+                keep.append(window)
+        return keep
@@ -14,6 +14,8 @@ import os
 import random
 import shutil
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from itertools import repeat
 from multiprocessing.pool import ThreadPool
 from pathlib import Path
@@ -134,8 +136,10 @@ class _RepeatSampler(object):
 
 class LoadImages:  # for inference
     def __init__(self, path, img_size=640, stride=32):
-        p = str(Path(path).absolute())  # os-agnostic absolute path
-        if '*' in p:
+        p = str(Path(path).absolute()) if isinstance(path, (str, Path)) else f'{len(path)} listed files'
+        if not isinstance(path, (str, Path)):
+            files = list(path)  # explicit file list, kept in this order
+        elif '*' in p:
             files = sorted(glob.glob(p, recursive=True))  # glob
         elif os.path.isdir(p):
             files = sorted(glob.glob(os.path.join(p, '*.*')))  # dir
@@ -144,7 +148,7 @@ class LoadImages:  # for inference
         else:
             raise Exception(f'ERROR: {p} does not exist')
 
-        images = [x for x in files if x.split('.')[-1].lower() in img_formats]
+        images = [x for x in files if x.split('.')[-1].lower() in img_formats + ['npy']]  # npy: raw tiles
         videos = [x for x in files if x.split('.')[-1].lower() in vid_formats]
         ni, nv = len(images), len(videos)
 
@@ -190,18 +194,24 @@ class LoadImages:  # for inference
         else:
             # Read image
             self.count += 1
-            img0 = cv2.imread(path)  # BGR
-            assert img0 is not None, 'Image Not Found ' + path
+            img, img0 = self.load(path)
             #print(f'image {self.count}/{self.nf} {path}: ', end='')
+            return path, img, img0, self.cap
 
+        return path, self.convert(img0), img0, self.cap
+
+    def load(self, path):
+        img0 = np.load(path) if path.endswith('.npy') else cv2.imread(path)  # BGR
+        assert img0 is not None, 'Image Not Found ' + path
+        return self.convert(img0), img0
+
+    def convert(self, img0):
         # Padded resize
         img = letterbox(img0, self.img_size, stride=self.stride)[0]
 
         # Convert
         img = img[:, :, ::-1].transpose(2, 0, 1)  # BGR to RGB, to 3x416x416
-        img = np.ascontiguousarray(img)
-
-        return path, img, img0, self.cap
+        return np.ascontiguousarray(img)
 
     def new_video(self, path):
         self.frame = 0
@@ -212,6 +222,117 @@ class LoadImages:  # for inference
         return self.nf  # number of files
 
 
+class LoadImagesPrefetch(LoadImages):  # for inference, decodes upcoming images on a thread pool
+    def __init__(self, path, img_size=640, stride=32, workers=4, prefetch=None):
+        super().__init__(path, img_size, stride)
+        self.workers = workers
+        self.prefetch = prefetch or 2 * workers  # images decoded ahead of the consumer
+        self.ni = self.video_flag.count(False)
+        self.executor = None
+
+    def __iter__(self):
+        # cv2 decode / resize release the GIL, so the pool overlaps them with the forward pass
+        self.count = 0
+        self.pending = deque()
+        self.next_file = 0
+        if self.executor is None and self.ni:
+            self.executor = ThreadPoolExecutor(self.workers)
+        for _ in range(self.prefetch):
+            self.submit()
+        return self
+
+    def submit(self):
+        if self.next_file < self.ni:
+            self.pending.append(self.executor.submit(self.load, self.files[self.next_file]))
+            self.next_file += 1
+
+    def __next__(self):
+        if self.count >= self.ni:  # videos: sequential reads
+            if self.executor is not None:
+                self.executor.shutdown(wait=False)
+                self.executor = None
+            return super().__next__()
+        path = self.files[self.count]
+        img, img0 = self.pending.popleft().result()  # file order
+        self.submit()
+        self.count += 1
+        return path, img, img0, self.cap
+
+
+class LoadTiles:  # for inference, in-memory tiles from utils.tiling.TileStream
+    def __init__(self, stream, img_size=640, stride=32, hwc=True, pin_memory=False):
+        self.stream = stream
+        self.img_size = img_size
+        self.stride = stride
+        self.hwc = hwc  # build the BGR HWC img0 (needed to draw and save boxes), else a zero-copy placeholder
+        self.pin_memory = pin_memory
+        self.buffers = {}  # letterboxed shape -> reused CHW buffer
+        self.alloc = None  # shape -> memory for the next letterboxed tile, set by batch_images to its batch slots
+        self.mode = 'image'
+        self.cap = None
+
+    def __iter__(self):
+        self.count = 0
+        self.tiles = iter(self.stream)
+        return self
+
+    def buffer(self, shape):
+        # Preallocated (pinned for faster host to device copies) uint8 tensor memory, shared through torch.from_numpy
+        if shape not in self.buffers:
+            self.buffers[shape] = torch.empty(shape, dtype=torch.uint8, pin_memory=self.pin_memory).numpy()
+        return self.buffers[shape]
+
+    def __next__(self):
+        tile_id, tile, self.transform = next(self.tiles)  # CHW RGB uint8
+        self.count += 1
+        path = f'tile_{tile_id}.jpg'  # virtual name, matches tile_coords.csv
+        if self.hwc:
+            img0 = np.ascontiguousarray(tile.transpose(1, 2, 0)[:, :, ::-1])  # BGR HWC, as cv2.imread
+        else:
+            img0 = np.broadcast_to(np.uint8(0), tile.shape[1:] + (3,))  # shape only
+
+        # Padded resize, straight from CHW RGB into a reused buffer (valid until the next tile) or a batch slot
+        img = letterbox_chw(tile, self.img_size, stride=self.stride, alloc=self.alloc or self.buffer)[0]
+
+        return path, img, img0, self.cap
+
+    def __len__(self):
+        return len(self.stream)
+
+
+def batch_images(dataset, batch_size=1, pin_memory=False):
+    # Groups consecutive same-shape images of LoadImages / LoadTiles into (paths, uint8 NCHW tensor, im0s, vid_cap)
+    # batches, in one reused batch tensor per image shape. LoadTiles letterboxes each tile straight into its
+    # slot; other images are copied in on arrival. The batch is valid until the next one is requested
+    buffers, group, shape = {}, [], None
+
+    def batch(s):
+        if s not in buffers:
+            buffers[s] = torch.empty((batch_size,) + s, dtype=torch.uint8, pin_memory=pin_memory)
+        return buffers[s]
+
+    def slot(s):
+        # Next free row of the batch of shape s; a new shape starts a new batch at row 0
+        return batch(s)[len(group) if s == shape else 0].numpy()
+
+    if hasattr(dataset, 'alloc'):
+        dataset.alloc = slot
+    for path, img, im0s, vid_cap in dataset:
+        if group and img.shape != shape:
+            yield [g[0] for g in group], buffers[shape][:len(group)], [g[1] for g in group], group[-1][2]
+            group = []
+        shape = img.shape
+        row = batch(shape)[len(group)]
+        if row.data_ptr() != img.ctypes.data:  # not letterboxed in place
+            row.copy_(torch.from_numpy(img))
+        group.append((path, im0s, vid_cap))
+        if len(group) == batch_size:
+            yield [g[0] for g in group], buffers[shape], [g[1] for g in group], vid_cap
+            group = []
+    if group:
+        yield [g[0] for g in group], buffers[shape][:len(group)], [g[1] for g in group], group[-1][2]
+
+
 class LoadWebcam:  # for inference
     def __init__(self, pipe='0', img_size=640, stride=32):
         self.img_size = img_size
@@ -1021,6 +1142,42 @@ def letterbox(img, new_shape=(640, 640), color=(114, 114, 114), auto=True, scale
     return img, ratio, (dw, dh)
 
 
+def letterbox_chw(img, new_shape=(640, 640), color=114, auto=True, scaleup=True, stride=32, alloc=None):
+    # letterbox() for CHW arrays: same geometry, no transpose or channel flip. A tile that needs no resize
+    # (e.g. read decimated to the model size) is only padded, with a single copy into alloc(shape) memory
+    c, h, w = img.shape
+    if isinstance(new_shape, int):
+        new_shape = (new_shape, new_shape)
+
+    # Scale ratio (new / old)
+    r = min(new_shape[0] / h, new_shape[1] / w)
+    if not scaleup:  # only scale down, do not scale up (for better test mAP)
+        r = min(r, 1.0)
+
+    # Compute padding
+    nw, nh = int(round(w * r)), int(round(h * r))
+    dw, dh = new_shape[1] - nw, new_shape[0] - nh  # wh padding
+    if auto:  # minimum rectangle
+        dw, dh = np.mod(dw, stride), np.mod(dh, stride)  # wh padding
+    dw /= 2  # divide padding into 2 sides
+    dh /= 2
+
+    if (w, h) != (nw, nh):  # resize, cv2 works on HWC
+        img = cv2.resize(np.ascontiguousarray(img.transpose(1, 2, 0)), (nw, nh), interpolation=cv2.INTER_LINEAR)
+        img = img.reshape(nh, nw, c).transpose(2, 0, 1)
+    top, bottom = int(round(dh - 0.1)), int(round(dh + 0.1))
+    left, right = int(round(dw - 0.1)), int(round(dw + 0.1))
+
+    shape = (c, top + nh + bottom, left + nw + right)
+    out = alloc(shape) if alloc else np.empty(shape, dtype=np.uint8)
+    out[:, :top] = color  # add border
+    out[:, top + nh:] = color
+    out[:, top:top + nh, :left] = color
+    out[:, top:top + nh, left + nw:] = color
+    out[:, top:top + nh, left:left + nw] = img
+    return out, (r, r), (dw, dh)
+
+
 def random_perspective(img, targets=(), segments=(), degrees=10, translate=.1, scale=.1, shear=10, perspective=0.0,
                        border=(0, 0)):
     # torchvision.transforms.RandomAffine(degrees=(-10, 10), translate=(.1, .1), scale=(.9, 1.1), shear=(-10, 10))
@@ -0,0 +1,25 @@
+"""
+
+File Name: file_utils.py
+Origin: Netflora (https://github.com/NetFlora/Netflora)
+
+"""
+
+import os
+import shutil
+from pathlib import Path
+
+
+def cache_root(name):
+    # <NETFLORA_CACHE>/<name>, ~/.cache/netflora by default; shared by the tile, weights and trace caches
+    return Path(os.environ.get('NETFLORA_CACHE', '~/.cache/netflora'), name).expanduser()
+
+
+def link_or_copy(src, dst):
+    # Hardlink when source and destination share a filesystem, copy otherwise
+    if os.path.lexists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
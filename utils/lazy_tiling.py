@@ -0,0 +1,97 @@
+"""
+
+File Name: lazy_tiling.py
+Origin: Netflora (https://github.com/NetFlora/Netflora)
+
+"""
+
+import math
+import os
+import threading
+
+import numpy as np
+import rasterio
+from rasterio.windows import Window, transform as window_transform
+
+from utils.tile_index import tile_stats
+from utils.tile_writer import write_tile
+
+try:
+    import dask
+    import dask.array as da
+except ImportError:
+    dask = da = None
+
+
+class RasterArray:
+    # Array protocol over a rasterio dataset for da.from_array: slices become window reads. Each thread
+    # (or process) opens its own handle on first use, dataset handles are never shared or pickled.
+    def __init__(self, path):
+        self.path = path
+        with rasterio.open(path) as src:
+            self.shape = (src.count, src.height, src.width)
+            self.dtype = np.dtype(src.dtypes[0])
+        self.ndim = len(self.shape)
+        self._local = threading.local()
+
+    def __getstate__(self):
+        return {k: v for k, v in self.__dict__.items() if k != '_local'}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._local = threading.local()
+
+    def __getitem__(self, key):
+        b, y, x = key
+        src = getattr(self._local, 'src', None)
+        if src is None:
+            src = self._local.src = rasterio.open(self.path)
+        return src.read(window=Window.from_slices(y, x))[b]
+
+
+def _tile_task(blocks, window, transform, path, codec, quality, subsampling, normalize, aoi, min_valid=None):
+    # Graph task: assembles one tile from its chunk and the halo chunks right and below it, then
+    # runs the empty check, AOI clip, normalization and encoding. Returns (written name, tile stats) or None.
+    tile = np.concatenate([np.concatenate(row, axis=2) for row in blocks], axis=1)
+    tile = tile[:, :int(window.height), :int(window.width)]
+    if aoi is not None:
+        tile = aoi.clip(np.ascontiguousarray(tile), window, transform)
+    if not np.any(tile):
+        return None
+    tile = normalize(tile) if normalize else tile
+    stats = tile_stats(tile)
+    if stats[0] < (min_valid or 0):
+        return None
+    write_tile(tile, path, codec, quality, subsampling)
+    return os.path.basename(path), stats
+
+
+class LazyRaster:
+    # The orthophoto as a lazy dask array chunked on the tile grid (chunk = tile step), so that a tile is
+    # its chunk plus an overlap-wide halo taken from the next chunks. Chunks are read once per band of
+    # tile rows and shared by every tile overlapping them; memory is bounded by one band of chunks.
+    def __init__(self, image_path, tile_size, overlap, scheduler='threads'):
+        assert da is not None, "reader='dask' requires dask: pip install 'dask[array]'"
+        self.step = tile_size - overlap
+        self.halo = math.ceil(overlap / self.step)  # neighbour chunks a tile reaches into
+        self.scheduler = scheduler
+        raster = RasterArray(image_path)
+        with rasterio.open(image_path) as src:
+            self.transform = src.transform
+            name = 'raster-' + dask.base.tokenize(os.path.abspath(image_path), os.stat(image_path).st_mtime_ns)
+        self.array = da.from_array(raster, chunks=(raster.shape[0], self.step, self.step), name=name, lock=False)
+        self.blocks = self.array.to_delayed()[0]  # (chunk rows, chunk cols) of delayed CHW arrays
+
+    def tile_band(self, band, windows, output_dir, codec='jpg', quality=75, subsampling='420', normalize=None,
+                  aoi=None, workers=None, min_valid=None):
+        # Same contract as tiling._tile_band: writes the band's non-empty tiles under temporary names
+        tasks = []
+        for k, window in enumerate(windows):
+            i, j = int(window.row_off) // self.step, int(window.col_off) // self.step
+            blocks = self.blocks[i:i + self.halo + 1, j:j + self.halo + 1].tolist()
+            tasks.append(dask.delayed(_tile_task)(
+                blocks, window, window_transform(window, self.transform),
+                os.path.join(output_dir, f'.band{band}_{k}.{codec}'), codec, quality, subsampling, normalize, aoi,
+                min_valid))
+        results = dask.compute(*tasks, scheduler=self.scheduler, num_workers=workers)
+        return [(r[0], k, r[1]) for k, r in enumerate(results) if r is not None]
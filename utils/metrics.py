@@ -16,6 +16,8 @@ import torch
 
 from . import general
 
+trapezoid = getattr(np, 'trapezoid', None) or np.trapz  # NumPy 2 renamed np.trapz to np.trapezoid
+
 
 def fitness(x):
     # Model fitness as a weighted combination of metrics
@@ -110,7 +112,7 @@ def compute_ap(recall, precision, v5_metric=False):
     method = 'interp'  # methods: 'continuous', 'interp'
     if method == 'interp':
         x = np.linspace(0, 1, 101)  # 101-point interp (COCO)
-        ap = np.trapz(np.interp(x, mrec, mpre), x)  # integrate
+        ap = trapezoid(np.interp(x, mrec, mpre), x)  # integrate
     else:  # 'continuous'
         i = np.where(mrec[1:] != mrec[:-1])[0]  # points where x axis (recall) changes
         ap = np.sum((mrec[i + 1] - mrec[i]) * mpre[i + 1])  # area under curve
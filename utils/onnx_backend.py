@@ -0,0 +1,39 @@
+"""
+
+File Name: onnx_backend.py
+Origin: Netflora (https://github.com/NetFlora/Netflora)
+
+"""
+
+import json
+import os
+
+import numpy as np
+import torch
+
+try:
+    import onnxruntime as ort
+except ImportError:
+    ort = None
+
+
+class OnnxModel:
+    # Drop-in for the torch model in detect.py: same stride/names attributes and model(img)[0] returning the
+    # raw prediction tensor, so NMS, coordinate scaling and label output are shared with the torch backend
+    def __init__(self, path, threads=None, providers=None):
+        assert ort is not None, "--backend onnxruntime requires onnxruntime: pip install onnxruntime"
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = threads or os.cpu_count() or 1
+        self.session = ort.InferenceSession(path, options, providers=providers or ['CPUExecutionProvider'])
+        meta = self.session.get_modelmeta().custom_metadata_map
+        assert 'stride' in meta and 'names' in meta, f'{path} has no stride/names metadata, re-export with export.py'
+        self.stride = torch.tensor(json.loads(meta['stride']))
+        self.names = json.loads(meta['names'])
+        self.input = self.session.get_inputs()[0].name
+
+    def __call__(self, img, augment=False):
+        assert not augment, 'augmented inference is not available with --backend onnxruntime'
+        x = np.ascontiguousarray(img.detach().cpu().numpy(), dtype=np.float32)
+        pred = self.session.run(None, {self.input: x})[0]
+        return torch.from_numpy(pred).to(img.device), None
@@ -0,0 +1,84 @@
+"""
+
+File Name: radiometry.py
+Origin: Netflora (https://github.com/NetFlora/Netflora)
+
+"""
+
+import numpy as np
+from rasterio.enums import ColorInterp
+
+from utils.coverage import sample_read
+
+
+def default_bands(src):
+    # 1-based RGB band indexes: by color interpretation when tagged, else the first three (or the first) band
+    interp = list(src.colorinterp)
+    if all(c in interp for c in (ColorInterp.red, ColorInterp.green, ColorInterp.blue)):
+        return [interp.index(c) + 1 for c in (ColorInterp.red, ColorInterp.green, ColorInterp.blue)]
+    return [1, 2, 3] if src.count >= 3 else [1]
+
+
+class Normalizer:
+    # Maps the selected bands of a tile to uint8 with a per-band linear stretch lo -> 0, hi -> 255.
+    # 8/16-bit integer rasters go through a lookup table indexed by the raw (unsigned view of the) pixel
+    # values, other types through one affine scale, so the per-tile cost stays close to a copy.
+    def __init__(self, bands, lo, hi, dtype):
+        self.bands = [int(b) for b in bands]  # 1-based, as rasterio indexes
+        self.lo = np.asarray(lo, dtype=np.float64)
+        self.hi = np.asarray(hi, dtype=np.float64)
+        self.dtype = np.dtype(dtype)
+        self.scale = 255 / np.maximum(self.hi - self.lo, 1E-12)
+        self.lut = None
+        if self.dtype.kind in 'ui' and self.dtype.itemsize <= 2:
+            unsigned = np.dtype(f'u{self.dtype.itemsize}')
+            values = np.arange(2 ** (8 * self.dtype.itemsize)).astype(unsigned).view(self.dtype).astype(np.float64)
+            self.unsigned = unsigned
+            self.lut = np.stack([self._stretch(values, i) for i in range(len(self.bands))])
+
+    @classmethod
+    def from_dataset(cls, src, bands=None, percentiles=(2, 98), max_side=1024):
+        # Percentile statistics of the valid pixels of a sample of src (overviews, or evenly spread blocks)
+        bands = list(bands or default_bands(src))
+        data, valid = sample_read(src, bands, max_side)
+
+        lo, hi = [], []
+        for band in data:
+            values = band[valid & np.isfinite(band)] if band.dtype.kind == 'f' else band[valid]
+            if values.size:
+                l, h = np.percentile(values, percentiles)
+            else:
+                l, h = 0, 255
+            lo.append(l)
+            hi.append(h)
+        return cls(bands, lo, hi, src.dtypes[bands[0] - 1])
+
+    def _stretch(self, x, i):
+        return (np.clip((x - self.lo[i]) * self.scale[i], 0, 255) + 0.5).astype(np.uint8)
+
+    def __call__(self, tile):
+        # CHW raster tile -> CHW uint8 with one channel per selected band
+        out = np.empty((len(self.bands),) + tile.shape[1:], dtype=np.uint8)
+        for i, b in enumerate(self.bands):
+            x = tile[b - 1]
+            if self.lut is not None:
+                np.take(self.lut[i], x.view(self.unsigned), out=out[i])
+            else:
+                buf = x.astype(np.float32)
+                np.nan_to_num(buf, copy=False)
+                buf -= self.lo[i]
+                buf *= self.scale[i]
+                np.clip(buf, 0, 255, out=buf)
+                buf += 0.5
+                out[i] = buf  # truncating cast
+        return out
+
+
+def make_normalizer(src, bands=None, stretch=None, max_side=1024):
+    # Normalizer for src, or None when tiles can go to the encoders as they are (8-bit, no band selection
+    # or stretch). 8-bit rasters with only a band selection keep their values.
+    if src.dtypes[0] == 'uint8' and bands is None and stretch is None:
+        return None
+    if src.dtypes[0] == 'uint8' and stretch is None:
+        return Normalizer(bands, [0] * len(bands), [255] * len(bands), 'uint8')
+    return Normalizer.from_dataset(src, bands, stretch or (2, 98), max_side)
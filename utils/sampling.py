@@ -0,0 +1,84 @@
+"""
+
+File Name: sampling.py
+Origin: Netflora (https://github.com/NetFlora/Netflora)
+
+"""
+
+import math
+import os
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from utils.file_utils import link_or_copy
+from utils.tile_index import TileIndex
+
+_samplers = {}  # (index path, mtime) -> TileSampler
+
+
+class TileSampler:
+    # KD-tree over the tile centers of a TileIndex, for picking threshold-preview samples
+    def __init__(self, index):
+        self.index = index
+        bounds = index.bounds_array()
+        self.centers = (bounds[:, :2] + bounds[:, 2:]) / 2
+        self.tree = cKDTree(self.centers) if len(self.centers) else None
+
+    @classmethod
+    def from_path(cls, index_path):
+        # Built once per tile index file, rebuilt when the file changes
+        key = (os.path.abspath(index_path), os.stat(index_path).st_mtime_ns)
+        if key not in _samplers:
+            _samplers.clear()
+            _samplers[key] = cls(TileIndex.load(index_path))
+        return _samplers[key]
+
+    def nearest(self, point, k=5, max_distance=np.inf):
+        # Up to k tile ids closest to point, nearest first
+        if self.tree is None or k < 1:
+            return []
+        d, i = self.tree.query(point, k=min(k, len(self.centers)), distance_upper_bound=max_distance)
+        d, i = np.atleast_1d(d), np.atleast_1d(i)
+        return [int(t) for t in i[np.isfinite(d)]]
+
+    def radius(self, point, r):
+        # All tile ids within r of point, nearest first
+        if self.tree is None:
+            return []
+        ids = np.array(self.tree.query_ball_point(point, r), dtype=np.int64)
+        d = np.linalg.norm(self.centers[ids] - np.asarray(point), axis=1)
+        return [int(t) for t in ids[np.argsort(d, kind='stable')]]
+
+    def stratified(self, n=5):
+        # About n tiles spread over the whole orthophoto: the tile nearest to each cell center of a regular grid
+        if self.tree is None or n < 1:
+            return []
+        (x0, y0), (x1, y1) = self.centers.min(0), self.centers.max(0)
+        aspect = (x1 - x0) / (y1 - y0) if y1 > y0 else 1.0
+        nx = max(1, round(math.sqrt(n * aspect)))
+        ny = max(1, math.ceil(n / nx))
+        xs = x0 + (np.arange(nx) + 0.5) * (x1 - x0) / nx
+        ys = y1 - (np.arange(ny) + 0.5) * (y1 - y0) / ny  # north to south
+        cells = np.stack(np.meshgrid(xs, ys), -1).reshape(-1, 2)
+        _, ids = self.tree.query(cells, k=1)
+        return list(dict.fromkeys(int(t) for t in ids))[:n]  # dedupe, keep grid order
+
+    def materialize(self, tile_ids, images_folder, output_folder, ext='jpg', link='hardlink'):
+        # Exposes the selected tiles in output_folder as hardlinks (copy across filesystems) or symlinks
+        os.makedirs(output_folder, exist_ok=True)
+        selected = []
+        for tile_id in tile_ids:
+            name = TileIndex.filename(tile_id, ext)
+            src, dst = os.path.join(images_folder, name), os.path.join(output_folder, name)
+            if not os.path.exists(src):
+                print(f"A imagem {name} não foi encontrada em {images_folder}.")
+                continue
+            if link == 'symlink':
+                if os.path.lexists(dst):
+                    os.remove(dst)
+                os.symlink(os.path.abspath(src), dst)
+            else:
+                link_or_copy(src, dst)
+            selected.append(name)
+        return selected
@@ -0,0 +1,71 @@
+"""
+
+File Name: thread_reader.py
+Origin: Netflora (https://github.com/NetFlora/Netflora)
+
+"""
+
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import rasterio
+from rasterio.enums import Resampling
+
+
+class ThreadReader:
+    # Window reads on a pool of threads, each holding its own dataset handle (rasterio handles are not
+    # thread-safe, GDAL releases the GIL while decompressing). Windows are queued at most `prefetch` ahead
+    # of the consumer and handed back in submission order, so memory stays bounded without processes.
+    def __init__(self, path, workers=None, prefetch=None):
+        self.path = path
+        self.workers = workers or min(8, os.cpu_count() or 1)
+        self.prefetch = prefetch or 2 * self.workers
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.handles = []
+
+    def dataset(self):
+        src = getattr(self.local, 'src', None)
+        if src is None:
+            src = self.local.src = rasterio.open(self.path)
+            with self.lock:
+                self.handles.append(src)
+        return src
+
+    def read(self, window, out_shape=None):
+        if out_shape is None:
+            return self.dataset().read(window=window)
+        return self.dataset().read(window=window, out_shape=out_shape, resampling=Resampling.average)
+
+    def iter_windows(self, windows, out_shape=None):
+        # Yields (window, CHW array) in order; out_shape(window) gives a decimated read shape
+        windows = iter(windows)
+        pending = deque()
+        try:
+            with ThreadPoolExecutor(self.workers) as executor:
+                def submit():
+                    window = next(windows, None)
+                    if window is not None:
+                        pending.append((window, executor.submit(self.read, window,
+                                                                out_shape(window) if out_shape else None)))
+
+                try:
+                    for _ in range(self.prefetch):
+                        submit()
+                    while pending:
+                        window, future = pending.popleft()
+                        submit()
+                        yield window, future.result()
+                finally:  # consumer stopped early: drop queued reads
+                    for _, future in pending:
+                        future.cancel()
+        finally:
+            self.close()
+
+    def close(self):
+        with self.lock:
+            for src in self.handles:
+                src.close()
+            self.handles = []
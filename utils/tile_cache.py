@@ -0,0 +1,101 @@
+"""
+
+File Name: tile_cache.py
+Origin: Netflora (https://github.com/NetFlora/Netflora)
+
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+
+from utils.file_utils import cache_root, link_or_copy
+
+CACHE_VERSION = 2  # bump when the tile naming or encoding changes
+HEADER_BYTES = 1 << 16
+
+
+def fingerprint(image_path):
+    # Cheap identity of an orthophoto: size, mtime and a hash of the header (GeoTIFF IFDs and geokeys)
+    st = os.stat(image_path)
+    with open(image_path, 'rb') as f:
+        header = hashlib.sha256(f.read(HEADER_BYTES)).hexdigest()
+    return {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'header_sha256': header}
+
+
+class TileCache:
+    # Tiles and coordinates of previous runs, keyed by orthophoto fingerprint + tiling parameters.
+    # Each entry is <root>/<key>/ with the tiles, tile_index.npz and a manifest.json; least recently
+    # used entries are evicted once the cache grows past max_bytes.
+    def __init__(self, root=None, max_bytes=20E9):
+        self.root = Path(root).expanduser() if root else cache_root('tiles')
+        self.max_bytes = max_bytes
+
+    def key(self, image_path, **params):
+        ident = {'version': CACHE_VERSION, 'source': fingerprint(image_path), 'params': params}
+        return hashlib.sha256(json.dumps(ident, sort_keys=True).encode()).hexdigest()[:24]
+
+    def manifest(self, key):
+        try:
+            with open(self.root / key / 'manifest.json', 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def restore(self, key, output_dir, index_path):
+        # Links cached tiles into output_dir and copies the tile index, returns the manifest or None on a miss
+        manifest = self.manifest(key)
+        if manifest is None:
+            return None
+        entry = self.root / key
+        os.makedirs(output_dir, exist_ok=True)
+        for name in manifest['tiles']:
+            link_or_copy(entry / name, os.path.join(output_dir, name))
+        shutil.copyfile(entry / 'tile_index.npz', index_path)
+
+        manifest['last_used'] = time.time()
+        self._write_manifest(entry, manifest)
+        return manifest
+
+    def store(self, key, output_dir, index_path, tiles, image_path, params, crs):
+        # Builds the entry in a temporary directory and renames it in place, then evicts
+        self.root.mkdir(parents=True, exist_ok=True)
+        entry = self.root / key
+        tmp = self.root / f'.{key}.{os.getpid()}.tmp'
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir()
+        for name in tiles:
+            link_or_copy(os.path.join(output_dir, name), tmp / name)
+        shutil.copyfile(index_path, tmp / 'tile_index.npz')
+
+        now = time.time()
+        manifest = {'key': key, 'source': os.path.abspath(image_path), 'fingerprint': fingerprint(image_path),
+                    'params': params, 'crs': str(crs), 'tiles': list(tiles), 'created': now, 'last_used': now,
+                    'bytes': sum(f.stat().st_size for f in tmp.iterdir())}
+        self._write_manifest(tmp, manifest)
+
+        shutil.rmtree(entry, ignore_errors=True)
+        try:
+            os.replace(tmp, entry)
+        except OSError:  # another run stored the same entry first
+            shutil.rmtree(tmp, ignore_errors=True)
+        self.evict()
+
+    def evict(self):
+        keys = [d.name for d in self.root.iterdir() if d.is_dir() and not d.name.startswith('.')]
+        entries = [m for m in map(self.manifest, keys) if m]
+        entries.sort(key=lambda m: m['last_used'])
+        total = sum(m['bytes'] for m in entries)
+        while entries and total > self.max_bytes:
+            m = entries.pop(0)
+            shutil.rmtree(self.root / m['key'], ignore_errors=True)
+            total -= m['bytes']
+
+    def _write_manifest(self, entry, manifest):
+        tmp = entry / 'manifest.json.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=4)
+        os.replace(tmp, entry / 'manifest.json')
@@ -0,0 +1,177 @@
+"""
+
+File Name: tile_index.py
+Origin: Netflora (https://github.com/NetFlora/Netflora)
+
+"""
+
+import csv
+import json
+import os
+import re
+
+import numpy as np
+from affine import Affine
+from rasterio.windows import Window
+
+INDEX_VERSION = 2
+INDEX_DTYPE = np.dtype([('tile_id', '<u4'), ('row', '<u4'), ('col', '<u4'),
+                        ('x', '<u4'), ('y', '<u4'), ('width', '<u4'), ('height', '<u4'),
+                        ('valid', '<f4'), ('mean', '<f4'), ('texture', '<f4')])
+NO_STATS = (np.nan, np.nan, np.nan)
+CSV_HEADER = ['filename', 'minX', 'minY', 'maxX', 'maxY', 'crs']
+
+
+def tile_stats(tile, step=4):
+    # (valid fraction, mean brightness, texture) of a CHW tile, estimated on every step-th pixel: valid pixels
+    # have a non-zero band, brightness is their mean luma (0-255 on 8-bit tiles) and texture its variance
+    t = tile[:3, ::step, ::step]
+    valid = np.any(t, axis=0)
+    n = int(valid.sum())
+    if n == 0:
+        return 0.0, 0.0, 0.0
+    t = t[:, valid].astype(np.float32)
+    gray = 0.299 * t[0] + 0.587 * t[1] + 0.114 * t[2] if len(t) == 3 else t.mean(0)
+    return n / valid.size, float(gray.mean()), float(gray.var())
+
+
+def remove_stale_tiles(output_dir, keep=()):
+    # Deletes the tile_<id> files in output_dir that are not in keep, left there by an earlier run with
+    # another grid or codec, so a folder of tiles always matches its tile index
+    keep = set(keep)
+    if not os.path.isdir(output_dir):
+        return
+    for name in os.listdir(output_dir):
+        path = os.path.join(output_dir, name)
+        if name.startswith('tile_') and TileIndex.tile_id(name) is not None and name not in keep \
+                and os.path.isfile(path):
+            os.remove(path)
+
+
+class TileIndex:
+    # Compact replacement for tile_coords.csv: one header (CRS, base affine transform, grid geometry)
+    # plus a structured array of windows. Tile ids are dense, so lookups are array indexing and
+    # georeferenced bounds are derived from the transform on demand.
+    def __init__(self, crs, transform, tile_size, overlap, width=None, height=None, records=None, out_size=None):
+        self.crs = crs
+        self.transform = transform
+        self.tile_size = tile_size
+        self.overlap = overlap
+        self.out_size = out_size  # tile pixels were decimated to this size, bounds stay full resolution
+        self.width = width
+        self.height = height
+        if records is not None and records.dtype != INDEX_DTYPE:  # version 1 index, no tile statistics
+            upgraded = np.zeros(len(records), dtype=INDEX_DTYPE)
+            for name in INDEX_DTYPE.names:
+                upgraded[name] = records[name] if name in records.dtype.names else np.nan
+            records = upgraded
+        self._rows = [] if records is None else [tuple(r) for r in records]
+        self._records = records
+
+    @classmethod
+    def from_dataset(cls, src, tile_size, overlap, out_size=None):
+        return cls(str(src.crs) if src.crs else '', src.transform, tile_size, overlap, src.width, src.height,
+                   out_size=out_size)
+
+    @staticmethod
+    def filename(tile_id, ext='jpg'):
+        return f'tile_{tile_id}.{ext}'
+
+    @staticmethod
+    def tile_id(filename):
+        # 'tile_12.jpg', 'runs/detect/exp/labels/tile_12.txt' -> 12
+        m = re.search(r'tile_(\d+)', os.path.basename(str(filename)))
+        return int(m.group(1)) if m else None
+
+    def add(self, window, stats=None):
+        # stats: tile_stats() of the written tile
+        tile_id = len(self._rows)
+        step = self.tile_size - self.overlap
+        x, y = int(window.col_off), int(window.row_off)
+        self._rows.append((tile_id, y // step, x // step, x, y, int(window.width), int(window.height),
+                           *(NO_STATS if stats is None else stats)))
+        self._records = None
+        return tile_id
+
+    @property
+    def records(self):
+        if self._records is None:
+            self._records = np.array(self._rows, dtype=INDEX_DTYPE)
+        return self._records
+
+    def __len__(self):
+        return len(self._rows)
+
+    def window(self, tile_id):
+        r = self.records[tile_id]
+        return Window(int(r['x']), int(r['y']), int(r['width']), int(r['height']))
+
+    def bounds(self, tile_id):
+        # (minX, minY, maxX, maxY) of one tile
+        return tuple(self.bounds_array(self.records[tile_id:tile_id + 1])[0])
+
+    def bounds_array(self, records=None):
+        # (n, 4) array of (minX, minY, maxX, maxY), vectorized over records
+        r = self.records if records is None else records
+        t = self.transform
+        x0, y0 = r['x'].astype(np.float64), r['y'].astype(np.float64)
+        x1, y1 = x0 + r['width'], y0 + r['height']
+        xs = np.stack([t.a * x + t.b * y + t.c for x, y in ((x0, y0), (x1, y0), (x0, y1), (x1, y1))])
+        ys = np.stack([t.d * x + t.e * y + t.f for x, y in ((x0, y0), (x1, y0), (x0, y1), (x1, y1))])
+        return np.stack([xs.min(0), ys.min(0), xs.max(0), ys.max(0)], axis=1)
+
+    def select(self, min_valid=0.0, min_texture=0.0, priority='texture'):
+        # Tile ids passing the thresholds, most informative (highest priority field) first; tiles without
+        # statistics are kept, in id order after the others
+        r = self.records
+        keep = ~((r['valid'] < min_valid) | (r['texture'] < min_texture))  # NaN compares False: kept
+        ids = r['tile_id'][keep]
+        score = np.nan_to_num(r[priority][keep], nan=-np.inf)
+        return [int(i) for i in ids[np.argsort(-score, kind='stable')]]
+
+    def order_files(self, files, min_valid=0.0, min_texture=0.0, priority='texture'):
+        # Tile files (tile_<id>.<ext>) in select() order without the tiles below the thresholds. Tile files with
+        # an id this index does not have are left over from another run and dropped; files that are not tiles
+        # follow in their original order
+        tiles, rest = {}, []
+        for f in files:
+            tile_id = self.tile_id(f)
+            if tile_id is None:
+                rest.append(f)
+            elif tile_id < len(self):
+                tiles[tile_id] = f
+        return [tiles[i] for i in self.select(min_valid, min_texture, priority) if i in tiles] + rest
+
+    def get(self, filename, default=None):
+        # Bounds by tile file or label name, mirroring dict.get on the legacy CSV
+        tile_id = self.tile_id(filename)
+        if tile_id is None or not 0 <= tile_id < len(self):
+            return default
+        return self.bounds(tile_id)
+
+    def header(self):
+        return {'version': INDEX_VERSION, 'crs': self.crs, 'transform': list(self.transform)[:6],
+                'tile_size': self.tile_size, 'overlap': self.overlap, 'width': self.width, 'height': self.height,
+                'out_size': self.out_size}
+
+    def save(self, path):
+        tmp = f'{path}.tmp'
+        with open(tmp, 'wb') as f:
+            np.savez(f, header=np.array(json.dumps(self.header())), records=self.records)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            header = json.loads(str(data['header']))
+            records = data['records']
+        return cls(header['crs'], Affine(*header['transform']), header['tile_size'], header['overlap'],
+                   header['width'], header['height'], records, header.get('out_size'))
+
+    def to_csv(self, path):
+        # Legacy tile_coords.csv export
+        with open(path, mode='w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(CSV_HEADER)
+            for r, b in zip(self.records, self.bounds_array()):
+                writer.writerow([self.filename(int(r['tile_id'])), *b.tolist(), self.crs])
@@ -0,0 +1,110 @@
+"""
+
+File Name: tile_writer.py
+Origin: Netflora (https://github.com/NetFlora/Netflora)
+
+"""
+
+import io
+import os
+import queue
+from threading import Lock, Thread
+
+import cv2
+import numpy as np
+
+CODECS = ['jpg', 'webp', 'png', 'npy']
+SUBSAMPLING = {'444': 0x111111, '422': 0x211111, '420': 0x221111}  # cv2.IMWRITE_JPEG_SAMPLING_FACTOR values
+
+
+def to_bgr(tile):
+    # HWC BGR uint8 (cv2 layout) of a CHW tile: drops alpha, repeats single-band rasters
+    if tile.shape[0] == 1:
+        tile = np.repeat(tile, 3, axis=0)
+    return np.ascontiguousarray(tile[2::-1].transpose(1, 2, 0))
+
+
+def encode_tile(tile, codec='jpg', quality=75, subsampling='420'):
+    # Encoded bytes of a CHW tile; quality is JPEG/WebP quality (WebP > 100 is lossless) or PNG compression level
+    img = to_bgr(tile)
+    if codec == 'npy':
+        buf = io.BytesIO()
+        np.save(buf, img)
+        return buf.getvalue()
+    if codec == 'jpg':
+        params = [cv2.IMWRITE_JPEG_QUALITY, quality]
+        if hasattr(cv2, 'IMWRITE_JPEG_SAMPLING_FACTOR'):  # opencv >= 4.5.5
+            params += [cv2.IMWRITE_JPEG_SAMPLING_FACTOR, SUBSAMPLING[subsampling]]
+    elif codec == 'webp':
+        params = [cv2.IMWRITE_WEBP_QUALITY, quality]
+    elif codec == 'png':
+        params = [cv2.IMWRITE_PNG_COMPRESSION, min(quality, 9)]
+    else:
+        raise ValueError(f"Unknown codec '{codec}', expected one of {CODECS}")
+    ok, buf = cv2.imencode(f'.{codec}', img, params)
+    assert ok, f'{codec} encoding failed'
+    return buf.tobytes()
+
+
+def write_tile(tile, path, codec='jpg', quality=75, subsampling='420'):
+    data = encode_tile(tile, codec, quality, subsampling)
+    with open(path + '.tmp', 'wb') as f:
+        f.write(data)
+    os.replace(path + '.tmp', path)  # atomic, and never writes through a hardlink into the tile cache
+    return len(data)
+
+
+class TileWriter:
+    # Pool of encoder threads fed by a bounded queue, so encoding overlaps the next raster reads
+    # (cv2 encoders release the GIL). submit() blocks once maxsize tiles are waiting.
+    def __init__(self, output_dir, codec='jpg', quality=75, subsampling='420', workers=4, maxsize=32):
+        assert codec in CODECS, f"Unknown codec '{codec}', expected one of {CODECS}"
+        self.output_dir = output_dir
+        self.codec = codec
+        self.quality = quality
+        self.subsampling = subsampling
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.lock = Lock()
+        self.completed = set()
+        self.bytes_written = 0
+        self.error = None
+        self.threads = [Thread(target=self._run, daemon=True) for _ in range(max(1, workers))]
+        for t in self.threads:
+            t.start()
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            tile_id, name, tile = item
+            try:
+                n = write_tile(tile, os.path.join(self.output_dir, name), self.codec, self.quality, self.subsampling)
+                with self.lock:
+                    self.completed.add(tile_id)
+                    self.bytes_written += n
+            except Exception as e:
+                self.error = self.error or e
+
+    def submit(self, tile_id, name, tile):
+        if self.error:
+            raise self.error
+        self.queue.put((tile_id, name, tile))
+
+    def done(self, tile_id):
+        with self.lock:
+            return tile_id in self.completed
+
+    def close(self):
+        for _ in self.threads:
+            self.queue.put(None)
+        for t in self.threads:
+            t.join()
+        if self.error:
+            raise self.error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,629 @@
+"""
+
+File Name: tiling.py
+Origin: Netflora (https://github.com/NetFlora/Netflora)
+
+Usage:
+    $ python tiles.py --algorithm PMFS --source ortho.tif --workers 8
+    $ python -m utils.tiling --source ortho.tif --size 1536 --overlap 768
+    $ python -m utils.tiling --source ortho.tif --algorithms Acai Palmeiras PMFS
+
+"""
+
+import argparse
+import json
+import math
+import os
+import queue
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import groupby
+from threading import Thread
+
+import numpy as np
+import rasterio
+from affine import Affine
+from rasterio.crs import CRS
+from rasterio.enums import Resampling
+from rasterio.windows import Window
+from tqdm import tqdm
+
+from utils.block_reader import BlockReader
+from utils.checkpoint import TilingCheckpoint
+from utils.coverage import CoverageGrid
+from utils.radiometry import make_normalizer
+from utils.tile_cache import TileCache, fingerprint
+from utils.tile_index import TileIndex, remove_stale_tiles, tile_stats
+from utils.thread_reader import ThreadReader
+from utils.tile_writer import CODECS, TileWriter, write_tile
+
+GDAL_CACHE_MIN = 16  # MB, GDAL_CACHEMAX floor
+
+# sha256: digest of the release asset, checked on download and on every cache reuse. None pins the digest
+# of the first download in the cache instead.
+SPECS = {
+    'Açaí': {'name': 'Acai', 'size': 1536, 'overlap': 128, 'link': 'https://github.com/NetFlora/Netflora/releases/download/Assets/ACAI_Embrapa00.pt', 'sha256': None},
+    'Palmeiras': {'name': 'Palmeiras', 'size': 1536, 'overlap': 256, 'link': 'https://github.com/NetFlora/Netflora/releases/download/Assets/PALMEIRAS_Embrapa00.pt', 'sha256': None},
+    'Castanheira': {'name': 'Castanheira', 'size': 2048, 'overlap': 1024, 'link': None, 'sha256': None},
+    'PMFS': {'name': 'PMFS', 'size': 1536, 'overlap': 768, 'link': 'https://github.com/NetFlora/Netflora/releases/download/Assets/PMFS_Embrapa00.pt', 'sha256': None},
+    'PFNMs': {'name': 'PFNMs', 'size': 1536, 'overlap': 512, 'link': 'https://github.com/NetFlora/Netflora/releases/download/Assets/NM_Embrapa00.pt', 'sha256': None},
+    'Ecológico': {'name': 'Ecologico', 'size': 3000, 'overlap': 0, 'link': None, 'sha256': None},
+}
+
+def get_spec(algorithm):
+    # 'Açaí' or 'Acai' (case-insensitive) -> ('Açaí', spec)
+    for key, spec in SPECS.items():
+        if algorithm == key or algorithm.lower() == spec['name'].lower():
+            return key, spec
+    raise KeyError(f"Unknown algorithm '{algorithm}', expected one of {[s['name'] for s in SPECS.values()]}")
+
+
+def tif_center(image_path):
+    with rasterio.open(image_path) as tif:
+        center_x = (tif.bounds.left + tif.bounds.right) / 2
+        center_y = (tif.bounds.top + tif.bounds.bottom) / 2
+    return center_x, center_y
+
+
+def load_aoi(path, src):
+    # AOI of a vector file in src's CRS, None without one
+    if not path:
+        return None
+    from utils.aoi import AOI  # geopandas, only needed here
+    return AOI(path, src)
+
+
+def tile_windows(width, height, tile_size, overlap):
+    # Row-major tile grid, same stepping as the original TileGenerator loop
+    step = tile_size - overlap
+    return [Window(j, i, min(tile_size, width - j), min(tile_size, height - i))
+            for i in range(0, height, step) for j in range(0, width, step)]
+
+
+def decimated_shape(src, window, tile_size, out_size):
+    # CHW shape of a window read at out_size / tile_size resolution (full resolution without out_size)
+    scale = min(1.0, out_size / tile_size) if out_size else 1.0
+    return src.count, max(1, round(window.height * scale)), max(1, round(window.width * scale))
+
+
+def tile_transform(src, window, shape):
+    # Affine transform of a (possibly decimated) tile array covering window
+    return src.window_transform(window) * Affine.scale(window.width / shape[-1], window.height / shape[-2])
+
+
+def iter_windows(src, windows, reader='window', tile_size=None, cache_blocks=None, out_size=None, aoi=None,
+                 threads=None):
+    # Yields (window, CHW array) for each window of a row-major grid (or a band of it).
+    # With out_size below tile_size every window is read straight at the reduced resolution;
+    # GDAL serves such reads from the closest overview level when the raster has overviews.
+    # With an AOI, pixels outside it are zeroed.
+    # reader='threads' reads windows on a pool of `threads` threads with their own dataset handles, in order.
+    if aoi is not None:
+        for window, tile in iter_windows(src, windows, reader, tile_size, cache_blocks, out_size, threads=threads):
+            yield window, aoi.clip(tile, window, tile_transform(src, window, tile.shape))
+    elif reader == 'threads':
+        decimate = out_size and tile_size and out_size < tile_size
+        out_shape = (lambda window: decimated_shape(src, window, tile_size, out_size)) if decimate else None
+        yield from ThreadReader(src.name, threads).iter_windows(windows, out_shape)
+    elif out_size and tile_size and out_size < tile_size:
+        for window in windows:
+            shape = decimated_shape(src, window, tile_size, out_size)
+            yield window, src.read(window=window, out_shape=shape, resampling=Resampling.average)
+    elif reader == 'window':
+        for window in windows:
+            yield window, src.read(window=window)
+    elif reader == 'block':
+        yield from BlockReader(src, tile_size=tile_size, cache_blocks=cache_blocks).iter_tiles(windows)
+    else:
+        raise ValueError(f"Unknown reader '{reader}', expected 'window', 'block' or 'threads'")
+
+
+def curve_index(i, j, n, order='hilbert'):
+    # Position of grid cell (row i, col j) along a Hilbert or Z-order (Morton) curve over an n x n grid, n = 2^k
+    d = 0
+    if order == 'zorder':
+        for b in range(n.bit_length()):
+            d |= ((j >> b) & 1) << (2 * b) | ((i >> b) & 1) << (2 * b + 1)
+        return d
+    x, y = j, i
+    s = n // 2
+    while s > 0:
+        rx, ry = int(x & s > 0), int(y & s > 0)
+        d += s * s * ((3 * rx) ^ ry)
+        if ry == 0:  # rotate the quadrant
+            if rx == 1:
+                x, y = n - 1 - x, n - 1 - y
+            x, y = y, x
+        s //= 2
+    return d
+
+
+def order_windows(windows, tile_size, overlap, order='row'):
+    # Traversal order of the tile grid: 'row' (row-major), or along a space-filling curve ('hilbert', 'zorder')
+    # so consecutive tiles are grid neighbours and share overlap in both directions while blocks are still cached
+    if order == 'row' or not windows:
+        return windows
+    if order not in ('hilbert', 'zorder'):
+        raise ValueError(f"Unknown order '{order}', expected 'row', 'hilbert' or 'zorder'")
+    step = tile_size - overlap
+    cells = [(int(w.row_off) // step, int(w.col_off) // step) for w in windows]
+    n = 1 << max(max(max(c) for c in cells), 1).bit_length()
+    keys = [curve_index(i, j, n, order) for i, j in cells]
+    return [windows[k] for k in sorted(range(len(windows)), key=keys.__getitem__)]
+
+
+def gdal_cache_mb(src, tile_size, overlap, order='row'):
+    # GDAL block cache (GDAL_CACHEMAX, MB) holding every block a tile can share with a later one: a full-width
+    # band of tile rows for row order, a 4 x 4 tile neighbourhood (one curve quadrant) for curve orders
+    block_h, block_w = src.block_shapes[0]
+    block_bytes = block_h * block_w * src.count * np.dtype(src.dtypes[0]).itemsize
+    rows = math.ceil(tile_size / block_h) + 1
+    if order == 'row':
+        n_blocks = rows * math.ceil(src.width / block_w)
+    else:
+        span = 3 * (tile_size - overlap) + tile_size
+        n_blocks = (math.ceil(span / block_h) + 1) * (math.ceil(span / block_w) + 1)
+    return max(GDAL_CACHE_MIN, math.ceil(1.25 * n_blocks * block_bytes / 2 ** 20))
+
+
+def coverage_grid(src, min_valid=None):
+    # CoverageGrid for a min_valid run, or None without a cheap source (overviews or internal mask)
+    if min_valid is None:
+        return None
+    coverage = CoverageGrid.from_dataset(src)
+    if coverage is None:
+        print('WARNING: no overviews or internal mask, --min-valid is checked per tile instead of by a pre-pass '
+              '(gdaladdo builds overviews)')
+    return coverage
+
+
+def grid_windows(src, tile_size, overlap, min_valid=None, aoi=None, order='row'):
+    # Tile grid of src; with min_valid set, windows below that valid-pixel fraction are dropped
+    # from a low-resolution coverage pre-pass instead of being read at full resolution.
+    # With an AOI, windows outside it are dropped first.
+    windows = tile_windows(src.width, src.height, tile_size, overlap)
+    if aoi is not None:
+        windows = aoi.filter(windows)
+    coverage = coverage_grid(src, min_valid)
+    if coverage is not None:
+        windows = coverage.filter(windows, min_valid)
+    return order_windows(windows, tile_size, overlap, order)
+
+
+def iter_tiles(src, tile_size, overlap, reader='window', cache_blocks=None, min_valid=None, out_size=None, aoi=None,
+               order='row'):
+    # Yields (window, CHW array) for every cell of the tile grid
+    windows = grid_windows(src, tile_size, overlap, min_valid, aoi, order)
+    yield from iter_windows(src, windows, reader, tile_size, cache_blocks, out_size, aoi)
+
+
+def to_rgb(tile):
+    # CHW uint8 RGB view of a tile: drops alpha like PIL's RGBA -> RGB, repeats single-band rasters
+    if tile.shape[0] == 1:
+        return np.repeat(tile, 3, axis=0)
+    return tile[:3]
+
+
+def row_bands(windows, band_rows):
+    # Splits a row-major grid into consecutive bands of band_rows tile rows
+    rows = [list(row) for _, row in groupby(windows, key=lambda w: int(w.row_off))]
+    return [[w for row in rows[i:i + band_rows] for w in row] for i in range(0, len(rows), band_rows)]
+
+
+def gdal_env(src, tile_size, overlap, order='row', gdal_cache=None, reader='window', out_size=None):
+    # rasterio.Env options for a tiling run; an int GDAL_CACHEMAX goes to GDALSetCacheMax64, in bytes.
+    # Only readers that re-read shared blocks through GDAL (window, threads, dask, decimated reads) get a cache
+    # sized from the tile geometry. The block reader decodes each block once into its own LRU, so GDAL gets
+    # the minimum instead of keeping a second copy of the band (in every worker process).
+    if gdal_cache == 0:
+        return {}
+    if gdal_cache is None and reader == 'block' and not (out_size and tile_size and out_size < tile_size):
+        gdal_cache = GDAL_CACHE_MIN
+    return {'GDAL_CACHEMAX': (gdal_cache or gdal_cache_mb(src, tile_size, overlap, order)) * 2 ** 20}
+
+
+def _tile_band(image_path, band, windows, output_dir, reader, tile_size, cache_blocks, out_size, codec, quality,
+               subsampling, normalize=None, aoi=None, min_valid=None):
+    # Worker: opens its own dataset handle and writes the band's non-empty tiles under temporary names
+    saved = []
+    with rasterio.open(image_path) as src:
+        windows = [Window(*w) for w in windows]
+        tiles = iter_windows(src, windows, reader, tile_size, cache_blocks, out_size, aoi)
+        for k, (window, tile) in enumerate(tiles):
+            if np.any(tile):
+                tile = normalize(tile) if normalize else tile
+                stats = tile_stats(tile)
+                if stats[0] < (min_valid or 0):
+                    continue
+                name = f'.band{band}_{k}.{codec}'
+                write_tile(tile, os.path.join(output_dir, name), codec, quality, subsampling)
+                saved.append((name, k, stats))
+    return saved
+
+
+def create_tiles(image_path, tile_size, overlap, output_dir, index_path, csv_path=None, reader='window',
+                 cache_blocks=None, workers=1, band_rows=None, min_valid=None, out_size=None, codec='jpg', quality=75,
+                 subsampling='420', encoders=4, cache=None, resume=True, bands=None, stretch=None, aoi=None,
+                 order='row', gdal_cache=None, scheduler='threads', progress=tqdm):
+    # Writes tile_<n>.<codec> for every non-empty grid cell and the TileIndex to index_path, returns (n_tiles, crs).
+    # In a single process, tiles are encoded by a pool of `encoders` threads while the next windows are read.
+    # With workers > 1 row bands are tiled in a process pool; names and index rows match the serial run.
+    # With a TileCache, a previous run on the same orthophoto and parameters is reused instead.
+    # Progress is checkpointed in output_dir; with resume, an interrupted run continues where it stopped.
+    # Other tile_<id> files in output_dir (an earlier run with another grid or codec) are removed.
+    # out_size (e.g. the detector --img-size) reads every tile already decimated to that resolution.
+    # High-bit-depth or multiband rasters are stretched to 8-bit (stretch percentiles, default 2-98) on the
+    # bands selection (1-based, default RGB); 8-bit RGB(A) rasters are written unchanged.
+    # aoi (vector file path) restricts tiling to the windows it intersects and blanks pixels outside it.
+    # order 'hilbert' or 'zorder' walks the grid along a space-filling curve; tile ids follow that order.
+    # gdal_cache sets GDAL_CACHEMAX (MB), by default from the tile geometry for readers that rely on GDAL's block
+    # cache and the minimum for the block reader (0 keeps GDAL's default).
+    # reader='threads' reads in one process with `workers` reader threads (default up to 8).
+    # reader='dask' tiles a lazy chunked array of the raster with the dask scheduler ('threads' or 'processes').
+    params = {'size': tile_size, 'overlap': overlap, 'min_valid': min_valid, 'out_size': out_size, 'codec': codec,
+              'quality': quality, 'subsampling': subsampling, 'bands': bands, 'stretch': stretch,
+              'aoi': fingerprint(aoi) if aoi else None, 'order': order}
+    if cache is not None:
+        key = cache.key(image_path, **params)
+        manifest = cache.restore(key, output_dir, index_path)
+        if manifest is not None:
+            remove_stale_tiles(output_dir, manifest['tiles'])
+            if csv_path:
+                TileIndex.load(index_path).to_csv(csv_path)
+            return len(manifest['tiles']), CRS.from_string(manifest['crs'])
+        tile_counter, crs = create_tiles(image_path, tile_size, overlap, output_dir, index_path, csv_path, reader,
+                                         cache_blocks, workers, band_rows, min_valid, out_size, codec, quality,
+                                         subsampling, encoders, resume=resume, bands=bands, stretch=stretch,
+                                         aoi=aoi, order=order, gdal_cache=gdal_cache, scheduler=scheduler,
+                                         progress=progress)
+        cache.store(key, output_dir, index_path, [TileIndex.filename(i, codec) for i in range(tile_counter)],
+                    image_path, params, crs)
+        return tile_counter, crs
+
+    os.makedirs(output_dir, exist_ok=True)
+    workers = workers or os.cpu_count()
+    checkpoint = TilingCheckpoint(os.path.join(output_dir, '.tiling_checkpoint.jsonl'),
+                                  {'source': fingerprint(image_path), 'params': params})
+
+    with rasterio.open(image_path) as src, rasterio.Env(**gdal_env(src, tile_size, overlap, order, gdal_cache, reader, out_size)):
+        index = TileIndex.from_dataset(src, tile_size, overlap, out_size)
+        normalize = make_normalizer(src, bands, stretch)
+        clip = load_aoi(aoi, src)
+
+        windows = grid_windows(src, tile_size, overlap, min_valid, clip, order)
+        pbar = progress(total=len(windows), desc="Creating Tiles")  # windows left after AOI / coverage filters
+
+        # Replay an interrupted run
+        done = checkpoint.load(output_dir, codec) if resume else []
+        remove_stale_tiles(output_dir, [TileIndex.filename(t, codec) for _, t, _ in done if t is not None])
+        for k, tile_id, stats in done:
+            if tile_id is not None:
+                index.add(windows[k], stats)
+        start = len(done)
+        checkpoint.open(done)
+        pbar.update(start)
+
+        if (workers == 1 and reader != 'dask') or reader == 'threads':
+            pending = deque()  # (window number, tile id, stats) not yet checkpointed, in grid order
+            with TileWriter(output_dir, codec, quality, subsampling, workers=encoders) as writer:
+                tiles = iter_windows(src, windows[start:], reader, tile_size, cache_blocks, out_size, clip,
+                                     threads=workers if workers > 1 else None)
+                for k, (window, tile) in enumerate(tiles, start):
+                    tile_id = stats = None
+                    if np.any(tile):
+                        tile = normalize(tile) if normalize else tile
+                        stats = tile_stats(tile)
+                        if stats[0] < (min_valid or 0):  # the coverage pre-pass is coarse, or was skipped
+                            stats = None
+                        else:
+                            tile_id = index.add(window, stats)
+                            writer.submit(tile_id, TileIndex.filename(tile_id, codec), tile)
+                    pending.append((k, tile_id, stats))
+                    while pending and (pending[0][1] is None or writer.done(pending[0][1])):
+                        checkpoint.record(*pending.popleft())
+                    pbar.update(1)
+            for k, tile_id, stats in pending:  # writer closed, every tile is on disk
+                checkpoint.record(k, tile_id, stats)
+        else:
+            if order == 'row':
+                n_rows = len(range(0, src.height, tile_size - overlap))
+                if reader == 'dask':  # chunk rows in memory: band + halo
+                    band_rows = band_rows or 2 * (math.ceil(overlap / (tile_size - overlap)) + 1)
+                parts = row_bands(windows[start:], band_rows or max(1, math.ceil(n_rows / (workers * 4))))
+            else:  # consecutive runs of the curve, which stay spatially compact
+                n = max(1, math.ceil((len(windows) - start) / (workers * 4)))
+                parts = [windows[i:i + n] for i in range(start, len(windows), n)]
+
+            executor = None
+            if reader == 'dask':  # one band of graph tasks at a time, on threads or processes
+                if out_size:
+                    raise ValueError("reader='dask' reads full resolution tiles, out_size is not supported")
+                from utils.lazy_tiling import LazyRaster  # optional dask dependency
+                lazy = LazyRaster(image_path, tile_size, overlap, scheduler)
+                results = (lazy.tile_band(b, band, output_dir, codec, quality, subsampling, normalize, clip, workers,
+                                          min_valid)
+                           for b, band in enumerate(parts))
+            else:
+                executor = ProcessPoolExecutor(workers)
+                futures = [executor.submit(_tile_band, image_path, b,
+                                           [(w.col_off, w.row_off, w.width, w.height) for w in band],
+                                           output_dir, reader, tile_size, cache_blocks, out_size, codec, quality,
+                                           subsampling, normalize, clip, min_valid)
+                           for b, band in enumerate(parts)]
+                results = (future.result() for future in futures)
+            try:
+                k = start
+                for band, saved in zip(parts, results):  # collect in grid order to keep numbering deterministic
+                    saved = {j: (name, stats) for name, j, stats in saved}
+                    for j, window in enumerate(band):
+                        tile_id = stats = None
+                        if j in saved:
+                            name, stats = saved[j]
+                            tile_id = index.add(window, stats)
+                            os.replace(os.path.join(output_dir, name),
+                                       os.path.join(output_dir, TileIndex.filename(tile_id, codec)))
+                        checkpoint.record(k, tile_id, stats)
+                        k += 1
+                    pbar.update(len(band))
+            except BaseException:  # failed or interrupted: drop queued bands instead of tiling them first
+                if executor is not None:
+                    executor.shutdown(cancel_futures=True)
+                raise
+            if executor is not None:
+                executor.shutdown()
+
+        pbar.close()
+        crs = src.crs
+
+    index.save(index_path)
+    if csv_path:
+        index.to_csv(csv_path)
+    checkpoint.close(remove=True)
+    return len(index), crs
+
+
+def create_tiles_multi(image_path, grids, output='processing', reader='window', cache_blocks=None, min_valid=None,
+                       codec='jpg', quality=75, subsampling='420', encoders=4, bands=None, stretch=None, aoi=None,
+                       workers=1, gdal_cache=None, progress=tqdm):
+    # Tiles several (size, overlap) grids, {name: (tile_size, overlap)}, in one pass over the raster: the grids'
+    # windows are merged in row-major order and cut from the same decoded blocks, sized for the largest tile.
+    # Each grid gets <output>/<name>/output_tiles and its own tile_index.npz, numbered exactly as create_tiles
+    # would number it. Returns ({name: n_tiles}, crs).
+    # The pass is serial in one process: reader 'window', 'block' or 'threads' (with `workers` reader threads).
+    if reader == 'dask':
+        raise ValueError("create_tiles_multi reads in one pass, reader='dask' is not supported")
+    dirs = {g: os.path.join(output, g, 'output_tiles') for g in grids}
+    for d in dirs.values():
+        os.makedirs(d, exist_ok=True)
+        remove_stale_tiles(d)
+
+    max_size, max_overlap = max(grids.values())
+    with rasterio.open(image_path) as src, rasterio.Env(**gdal_env(src, max_size, max_overlap, 'row', gdal_cache, reader)):
+        coverage = coverage_grid(src, min_valid)
+        normalize = make_normalizer(src, bands, stretch)
+        clip = load_aoi(aoi, src)
+        indexes, merged = {}, []
+        for g, (tile_size, overlap) in grids.items():
+            indexes[g] = TileIndex.from_dataset(src, tile_size, overlap)
+            windows = tile_windows(src.width, src.height, tile_size, overlap)
+            if clip is not None:
+                windows = clip.filter(windows)
+            if coverage is not None:
+                windows = coverage.filter(windows, min_valid)
+            merged += [(int(w.row_off), int(w.col_off), g, w) for w in windows]
+        merged.sort(key=lambda m: m[:2])  # stable: grids keep their own row-major order
+
+        tiles = iter_windows(src, [m[3] for m in merged], reader, max_size, cache_blocks, aoi=clip,
+                             threads=(workers or os.cpu_count()) if reader == 'threads' else None)
+        with TileWriter(output, codec, quality, subsampling, workers=encoders) as writer:
+            for (_, _, g, window), (_, tile) in progress(zip(merged, tiles), total=len(merged), desc="Creating Tiles"):
+                if np.any(tile):
+                    tile = normalize(tile) if normalize else tile
+                    stats = tile_stats(tile)
+                    if stats[0] < (min_valid or 0):
+                        continue
+                    tile_id = indexes[g].add(window, stats)
+                    writer.submit((g, tile_id), os.path.join(g, 'output_tiles', TileIndex.filename(tile_id, codec)),
+                                  tile)
+        crs = src.crs
+
+    for g, index in indexes.items():
+        index.save(os.path.join(output, g, 'tile_index.npz'))
+    return {g: len(index) for g, index in indexes.items()}, crs
+
+
+class TileStream:
+    # Tiles an orthophoto on a background thread and hands (tile_id, CHW uint8 array, affine transform)
+    # to the consumer through a bounded queue; only the tile index (and tiles with dump_dir) is written
+    def __init__(self, image_path, tile_size, overlap, index_path=None, dump_dir=None, reader='window',
+                 cache_blocks=None, min_valid=None, out_size=None, bands=None, stretch=None, aoi=None, order='row',
+                 min_texture=0.0, maxsize=8):
+        self.image_path = image_path
+        self.tile_size = tile_size
+        self.overlap = overlap
+        self.index_path = index_path
+        self.dump_dir = dump_dir
+        self.reader = reader
+        self.cache_blocks = cache_blocks
+        self.min_valid = min_valid
+        self.out_size = out_size
+        self.bands = bands
+        self.stretch = stretch
+        self.aoi = aoi
+        self.order = order
+        self.min_texture = min_texture  # skip low-information tiles (luma variance below this)
+        self.min_valid_pixels = min_valid or 0.0  # per-tile valid fraction, finer than the coverage pre-pass
+        with rasterio.open(image_path) as src:
+            self.crs = src.crs
+            self.n_windows = len(tile_windows(src.width, src.height, tile_size, overlap))
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.thread = Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        try:
+            if self.dump_dir:
+                os.makedirs(self.dump_dir, exist_ok=True)
+                remove_stale_tiles(self.dump_dir)
+            with rasterio.open(self.image_path) as src, \
+                    rasterio.Env(**gdal_env(src, self.tile_size, self.overlap, self.order, reader=self.reader,
+                                            out_size=self.out_size)):
+                self.index = TileIndex.from_dataset(src, self.tile_size, self.overlap, self.out_size)
+                normalize = make_normalizer(src, self.bands, self.stretch)
+                clip = load_aoi(self.aoi, src)
+                for window, tile in iter_tiles(src, self.tile_size, self.overlap, self.reader, self.cache_blocks,
+                                                 self.min_valid, self.out_size, clip, self.order):
+                    if np.any(tile):
+                        tile = normalize(tile) if normalize else tile
+                        stats = tile_stats(tile)
+                        tile_id = self.index.add(window, stats)
+                        if stats[0] < self.min_valid_pixels or stats[2] < self.min_texture:
+                            continue  # indexed, but not worth running the detector on
+                        if self.dump_dir:
+                            write_tile(tile, os.path.join(self.dump_dir, TileIndex.filename(tile_id)))
+                        self.queue.put((tile_id, to_rgb(tile), tile_transform(src, window, tile.shape)))
+            if self.index_path:
+                self.index.save(self.index_path)
+        except Exception as e:
+            self.queue.put(e)
+        finally:
+            self.queue.put(None)
+
+    def __iter__(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+    def __len__(self):
+        return self.n_windows  # upper bound, empty tiles are never emitted
+
+
+def select_samples(index_path, center, max_distance=100, max_images=5, images_folder='processing/output_tiles',
+                   output_folder='processing/selected_images', strategy='nearest', link='hardlink', ext='jpg'):
+    # Threshold-preview samples; strategy: 'nearest' (k nearest within max_distance),
+    # 'radius' (all within max_distance) or 'stratified' (spread over the orthophoto)
+    from utils.sampling import TileSampler  # scipy, only needed here
+    sampler = TileSampler.from_path(index_path)
+
+    if strategy == 'nearest':
+        tile_ids = sampler.nearest(center, k=max_images, max_distance=max_distance)
+    elif strategy == 'radius':
+        tile_ids = sampler.radius(center, max_distance)
+    elif strategy == 'stratified':
+        tile_ids = sampler.stratified(max_images)
+    else:
+        raise ValueError(f"Unknown strategy '{strategy}', expected 'nearest', 'radius' or 'stratified'")
+
+    return sampler.materialize(tile_ids, images_folder, output_folder, ext=ext, link=link)
+
+
+def run_tiling(algorithm, image_path, output='processing', weights_path='model_weights.pt', weights=None,
+               log=lambda msg, color=None: print(msg), **kwargs):
+    # Full "Gerar Tiles" step: weights, tiles + index, preview samples and variable.json under output.
+    # kwargs go to create_tiles (workers, min_valid, out_size, codec, cache, progress, ...).
+    key, spec = get_spec(algorithm)
+    if spec['link'] is None:
+        raise ValueError(f"O algoritmo {spec['name']} está em fase de desenvolvimento.")
+    output_dir = os.path.join(output, 'output_tiles')
+    index_path = os.path.join(output, 'tile_index.npz')
+
+    log('Carregando algoritmo...', 'orange')
+    if weights is None:
+        from utils.weights import WeightsManager  # requests, only needed here
+        weights = WeightsManager()
+    weights.install(spec['link'], weights_path, spec['name'], spec['sha256'])
+    log('O algoritmo foi carregado com sucesso.', 'green')
+
+    n, crs = create_tiles(image_path, spec['size'], spec['overlap'], output_dir, index_path, **kwargs)
+    log(f'Número total de tiles criados: {n}', 'green')
+
+    selected = select_samples(index_path, tif_center(image_path), images_folder=output_dir,
+                              output_folder=os.path.join(output, 'selected_images'), ext=kwargs.get('codec', 'jpg'))
+    log(f"{len(selected)} imagens foram selecionadas em {os.path.join(output, 'selected_images')}.")
+
+    variables = {
+        'crs': str(crs),
+        'algorithm': key,
+        'tile_size': spec['size'],
+        'overlap': spec['overlap']
+    }
+    with open(os.path.join(output, 'variable.json'), 'w') as f:
+        json.dump(variables, f, indent=4)
+    return variables
+
+
+def main(opt):
+    kwargs = dict(reader=opt.reader, workers=opt.workers, min_valid=opt.min_valid, out_size=opt.out_size,
+                  codec=opt.codec, quality=opt.quality, subsampling=opt.subsampling, encoders=opt.encoders,
+                  cache=TileCache(opt.cache_dir, opt.cache_max_gb * 1E9) if opt.cache else None,
+                  resume=not opt.no_resume, bands=opt.bands, stretch=opt.stretch, aoi=opt.aoi, order=opt.order,
+                  gdal_cache=opt.gdal_cache, scheduler=opt.scheduler)
+    if opt.algorithms:
+        specs = [get_spec(a) for a in opt.algorithms]
+        counts, crs = create_tiles_multi(opt.source, {s['name']: (s['size'], s['overlap']) for _, s in specs},
+                                         opt.output, opt.reader, min_valid=opt.min_valid, codec=opt.codec,
+                                         quality=opt.quality, subsampling=opt.subsampling, encoders=opt.encoders,
+                                         bands=opt.bands, stretch=opt.stretch, aoi=opt.aoi, workers=opt.workers,
+                                         gdal_cache=opt.gdal_cache)
+        for key, s in specs:
+            variables = {'crs': str(crs), 'algorithm': key, 'tile_size': s['size'], 'overlap': s['overlap']}
+            with open(os.path.join(opt.output, s['name'], 'variable.json'), 'w') as f:
+                json.dump(variables, f, indent=4)
+            print(f"{counts[s['name']]} tiles written to {os.path.join(opt.output, s['name'])}")
+    elif opt.algorithm:
+        run_tiling(opt.algorithm, opt.source, opt.output, opt.weights, **kwargs)
+    else:
+        output_dir, index_path = os.path.join(opt.output, 'output_tiles'), os.path.join(opt.output, 'tile_index.npz')
+        n, crs = create_tiles(opt.source, opt.size, opt.overlap, output_dir, index_path, opt.csv, **kwargs)
+        print(f'{n} tiles written to {output_dir} ({crs})')
+
+
+def parse_opt():
+    parser = argparse.ArgumentParser(description="Tile an orthophoto without the notebook interface.")
+    parser.add_argument('--source', type=str, required=True, help='orthophoto path')
+    parser.add_argument('--algorithm', type=str, default='', help=f"{', '.join(s['name'] for s in SPECS.values())}")
+    parser.add_argument('--algorithms', nargs='+', default=None, help='tile for several algorithms in one pass')
+    parser.add_argument('--size', type=int, default=1536, help='tile size (pixels), without --algorithm')
+    parser.add_argument('--overlap', type=int, default=128, help='tile overlap (pixels), without --algorithm')
+    parser.add_argument('--output', type=str, default='processing', help='output folder (tiles, index, samples)')
+    parser.add_argument('--weights', type=str, default='model_weights.pt', help='--algorithm weights destination')
+    parser.add_argument('--csv', type=str, default='', help='also export the legacy tile_coords.csv here')
+    parser.add_argument('--reader', type=str, default='window', choices=['window', 'block', 'threads', 'dask'], help='raster read strategy (block: own block LRU, minimal GDAL cache)')
+    parser.add_argument('--workers', type=int, default=1, help='tiling processes (threads/dask: workers), 0 for all cores')
+    parser.add_argument('--scheduler', type=str, default='threads', choices=['threads', 'processes'], help='dask scheduler')
+    parser.add_argument('--min-valid', type=float, default=None, help='skip tiles below this valid-pixel fraction')
+    parser.add_argument('--out-size', type=int, default=None, help='read tiles decimated to this size (model --img-size)')
+    parser.add_argument('--codec', type=str, default='jpg', choices=CODECS, help='tile encoding')
+    parser.add_argument('--quality', type=int, default=75, help='JPEG/WebP quality (WebP > 100 lossless), PNG level')
+    parser.add_argument('--subsampling', type=str, default='420', choices=['444', '422', '420'], help='JPEG chroma')
+    parser.add_argument('--encoders', type=int, default=4, help='tile encoder threads')
+    parser.add_argument('--bands', nargs='+', type=int, default=None, help='RGB band indexes (1-based), e.g. --bands 3 2 1')
+    parser.add_argument('--stretch', nargs=2, type=float, default=None, help='8-bit stretch percentiles (default 2 98)')
+    parser.add_argument('--aoi', type=str, default='', help='only tile inside this area of interest (GeoPackage, shapefile)')
+    parser.add_argument('--order', type=str, default='row', choices=['row', 'hilbert', 'zorder'], help='tile traversal')
+    parser.add_argument('--gdal-cache', type=int, default=None, help='GDAL_CACHEMAX (MB), default from tile geometry (minimal for --reader block)')
+    parser.add_argument('--no-resume', action='store_true', help='ignore the checkpoint of an interrupted run')
+    parser.add_argument('--cache', action='store_true', help='reuse tiles of a previous run with the same inputs')
+    parser.add_argument('--cache-dir', type=str, default=None, help='tile cache directory (default ~/.cache/netflora/tiles)')
+    parser.add_argument('--cache-max-gb', type=float, default=20, help='tile cache size limit (GB)')
+    opt = parser.parse_args()
+    if opt.algorithms:  # one serial pass over the raster, without checkpoint or tile cache
+        unsupported = [flag for flag, used in (('--reader dask', opt.reader == 'dask'),
+                                               ('--workers', opt.workers != 1 and opt.reader != 'threads'),
+                                               ('--out-size', opt.out_size is not None),
+                                               ('--order', opt.order != 'row'),
+                                               ('--cache', opt.cache),
+                                               ('--no-resume', opt.no_resume),
+                                               ('--csv', bool(opt.csv))) if used]
+        if unsupported:
+            parser.error(f"--algorithms tiles in one serial pass and does not support {', '.join(unsupported)}"
+                         + (' (--workers needs --reader threads)' if '--workers' in unsupported else ''))
+    return opt
+
+
+if __name__ == '__main__':
+    main(parse_opt())
@@ -9,6 +9,8 @@ Origin: yolov7 (https://github.com/WongKinYiu/yolov7)
 # YOLOR PyTorch utils
 
 import datetime
+import hashlib
+import json
 import logging
 import math
 import os
@@ -355,9 +357,21 @@ def revert_sync_batchnorm(module):
     return module_output
 
 
+def trace_cache_path(weights, img_size, device, cache_dir=None):
+    # Trace cache entry keyed by the weights content, input size, device and torch version
+    from utils.file_utils import cache_root
+    from utils.weights import file_sha256, verified_sha256  # pulls in requests, only needed here
+    weights = weights if isinstance(weights, (list, tuple)) else [weights]
+    digests = [verified_sha256(w) or file_sha256(w) for w in weights]  # sidecar next to cached downloads
+    ident = {'weights': digests, 'img_size': img_size, 'device': str(device), 'torch': torch.__version__}
+    key = hashlib.sha256(json.dumps(ident, sort_keys=True).encode()).hexdigest()[:24]
+    root = Path(cache_dir).expanduser() if cache_dir else cache_root('traces')
+    return root / f'{key}.pt'
+
+
 class TracedModel(nn.Module):
 
-    def __init__(self, model=None, device=None, img_size=(640,640)): 
+    def __init__(self, model=None, device=None, img_size=(640,640), weights=None, cache_dir=None): 
         super(TracedModel, self).__init__()
         
         print(" Convert model to Traced-model... ") 
@@ -371,13 +385,29 @@ class TracedModel(nn.Module):
 
         self.detect_layer = self.model.model[-1]
         self.model.traced = True
+
+        traced_script_module = None
+        path = trace_cache_path(weights, img_size, device, cache_dir) if weights else None
+        if path is not None and path.exists():
+            try:
+                traced_script_module = torch.jit.load(str(path), map_location='cpu')
+                print(f" traced model loaded from cache {path} ")
+            except Exception as e:  # truncated or written by an incompatible build: trace again
+                print(f" ignoring cached trace {path}: {e} ")
+
+        if traced_script_module is None:
+            rand_example = torch.rand(1, 3, img_size, img_size)
         
-        rand_example = torch.rand(1, 3, img_size, img_size)
-        
-        traced_script_module = torch.jit.trace(self.model, rand_example, strict=False)
-        #traced_script_module = torch.jit.script(self.model)
-        traced_script_module.save("traced_model.pt")
-        print(" traced_script_module saved! ")
+            traced_script_module = torch.jit.trace(self.model, rand_example, strict=False)
+            #traced_script_module = torch.jit.script(self.model)
+            if path is None:
+                traced_script_module.save("traced_model.pt")
+            else:  # concurrent runs each write a private file, the last rename wins with identical content
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp = path.with_name(f'.{path.stem}.{os.getpid()}.tmp')
+                traced_script_module.save(str(tmp))
+                os.replace(tmp, path)
+            print(" traced_script_module saved! ")
         self.model = traced_script_module
         self.model.to(device)
         self.detect_layer.to(device)
@@ -0,0 +1,130 @@
+"""
+
+File Name: weights.py
+Origin: Netflora (https://github.com/NetFlora/Netflora)
+
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+from pathlib import Path
+
+import requests
+
+from utils.file_utils import cache_root, link_or_copy
+
+CHUNK = 1 << 20
+
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def write_sidecar(path, digest):
+    # <path>.sha256 with the digest and the size/mtime it was computed for
+    st = os.stat(path)
+    Path(f'{path}.sha256').write_text(json.dumps({'sha256': digest, 'size': st.st_size, 'mtime_ns': st.st_mtime_ns}))
+
+
+def verified_sha256(path):
+    # SHA-256 of a cached file, or None when it has no sidecar or no longer matches it. Unchanged size and
+    # mtime trust the sidecar, anything else re-hashes the file.
+    try:
+        text = Path(f'{path}.sha256').read_text().strip()
+        st = os.stat(path)
+    except OSError:
+        return None
+    meta = json.loads(text) if text.startswith('{') else {'sha256': text}  # plain digest of older caches
+    if (meta.get('size'), meta.get('mtime_ns')) != (st.st_size, st.st_mtime_ns):
+        if file_sha256(path) != meta['sha256']:
+            return None
+        write_sidecar(path, meta['sha256'])
+    return meta['sha256']
+
+
+class WeightsManager:
+    # Local cache of model weights at <root>/<algorithm>/<url hash>/<file name>. Downloads stream to a .part
+    # file in chunks, resume with HTTP Range requests, are checked against an optional SHA-256 and are
+    # reused across runs, and across algorithms that point at the same URL, after checking the cached file
+    # against its sidecar digest. Cached files are never handed out as hardlinks.
+    def __init__(self, root=None, timeout=60, retries=3, session=None):
+        self.root = Path(root).expanduser() if root else cache_root('weights')
+        self.timeout = timeout
+        self.retries = retries
+        self.session = session or requests.Session()
+
+    def path(self, url, algorithm=''):
+        url_hash = hashlib.sha256(url.encode()).hexdigest()[:16]
+        name = os.path.basename(url.split('?')[0]) or 'weights.pt'
+        return self.root / (re.sub(r'[^\w.-]', '_', algorithm) or '_') / url_hash / name
+
+    def cached(self, url, algorithm='', sha256=None):
+        # Path of a verified cached copy, or None
+        dst = self.path(url, algorithm)
+        candidates = [dst] + [f for f in sorted(self.root.glob(f'*/{dst.parent.name}/{dst.name}')) if f != dst]
+        for f in candidates:
+            if not f.exists():
+                continue
+            digest = verified_sha256(f)
+            if digest is None or (sha256 is not None and digest != sha256):
+                print(f'Cached weights {f} failed verification, ignoring them')
+                continue
+            if f != dst:  # same URL under another algorithm
+                dst.parent.mkdir(parents=True, exist_ok=True)
+                link_or_copy(f, dst)
+                write_sidecar(dst, digest)
+            return dst
+        return None
+
+    def fetch(self, url, algorithm='', sha256=None):
+        dst = self.cached(url, algorithm, sha256)
+        if dst is not None:
+            return dst
+
+        dst = self.path(url, algorithm)
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        part = Path(f'{dst}.part')
+        for attempt in range(self.retries):
+            try:
+                self._download(url, part)
+                break
+            except requests.RequestException as e:
+                if attempt == self.retries - 1:
+                    raise
+                print(f'Download interrompido ({e}), retomando...')
+
+        digest = file_sha256(part)
+        if sha256 is not None and digest != sha256:
+            part.unlink()
+            raise ValueError(f'Checksum mismatch for {url}: expected {sha256}, got {digest}')
+        os.replace(part, dst)
+        write_sidecar(dst, digest)
+        return dst
+
+    def install(self, url, output_path, algorithm='', sha256=None):
+        # Fetches (or reuses) the weights and copies them to output_path; a hardlink would let any write to
+        # output_path corrupt the cache entry
+        tmp = f'{output_path}.tmp'
+        shutil.copyfile(self.fetch(url, algorithm, sha256), tmp)
+        os.replace(tmp, output_path)
+        return output_path
+
+    def _download(self, url, part):
+        offset = part.stat().st_size if part.exists() else 0
+        headers = {'Range': f'bytes={offset}-'} if offset else {}
+        with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as r:
+            if offset and r.status_code == 416:  # .part already holds the whole file
+                return
+            r.raise_for_status()
+            resumed = offset and r.status_code == 206 and \
+                r.headers.get('Content-Range', '').startswith(f'bytes {offset}-')
+            with open(part, 'ab' if resumed else 'wb') as f:
+                for chunk in r.iter_content(CHUNK):
+                    f.write(chunk)